@@ -1,106 +1,267 @@
+import bisect
 import math
-import matplotlib.pyplot as plt
 
-from point import Point
+import numpy as np
 
+from geometry import plotting, stats
 
-def find_point(vertices, edges, point):
-    #if is_regularized_graph:
-       # print("The chain method cannot be used")
-       # return
-    if check_vertex(point, vertices) or check_edge(point, edges):
+from .point import Point
+from .regularization import is_regular, regularize
+
+
+def find_point(graph, point, render=False):
+    # render: True to show the graph with the located chains, or an observer from geometry.plotting
+    if check_vertex(point, graph.vertices) or check_edge(point, graph.edges):
         return
 
-    in_edges = [[] for _ in vertices]
-    out_edges = [[] for _ in vertices]
+    if not is_regular(graph):
+        graph, added = regularize(graph)
+        print(f"Regularization added {added} edges")
+
+    weights = adjust_edge_weights(graph)
+    chains = create_chains(graph, weights)
+    print_chains(graph, chains)
+    chain = locate_point(point, graph, chains)
+    observer = plotting.observer(render)
+    if observer:
+        observer(show_graph, point, graph, chains, chain)
+
+
+# Codes returned by ChainLocator.locate/locate_many instead of a chain index
+VERTEX = -2
+EDGE = -3
+OUTSIDE = -4
+
+
+class ChainLocator:
+    # Builds the chains once; every query is then a binary search over the chains
+    # and a binary search by y inside the chain, O(log^2 n) per point.
+
+    def __init__(self, graph):
+        # Number of edges added to make the graph regular
+        self.added_edges = 0
+        if not is_regular(graph):
+            graph, self.added_edges = regularize(graph)
+
+        self.graph = graph
+        xs, ys = graph.xs.tolist(), graph.ys.tolist()
+        self._vertex_set = set(zip(xs, ys))
+        self._vertex_keys = graph.xs + 1j * graph.ys
+        # A graph of one vertex (or none) has no chains; its queries are VERTEX or OUTSIDE
+        # without any arrays
+        self.chains = create_chains(graph, balance_edge_weights(graph)) if len(graph) > 1 else []
+        if not self.chains:
+            return
+
+        starts, ends = graph.starts.tolist(), graph.ends.tolist()
+        self.bottom = ys[0]
+        self.top = ys[-1]
+        # Vertices along each chain, used to find the edge at the query height
+        self._build_arrays([[starts[chain[0]]] + [ends[edge] for edge in chain] for chain in self.chains])
+
+    def _build_arrays(self, chain_vertices):
+        # All chains are stored back to back in flat coordinate arrays. A chain vertex gets the
+        # key chain * len(levels) + rank of its y, so one np.searchsorted over the keys finds
+        # the edge of any chain at any query height.
+        self._levels = np.unique(self.graph.ys)
+        lengths = np.array([len(chain) for chain in chain_vertices], dtype=np.int64)
+        ids = np.concatenate(chain_vertices)
+        self._xs = self.graph.xs[ids].astype(np.float64)
+        self._ys = self.graph.ys[ids].astype(np.float64)
+        ranks = np.searchsorted(self._levels, self._ys)
+        self._keys = np.repeat(np.arange(len(lengths)), lengths) * len(self._levels) + ranks
+
+        # Leftmost and rightmost x of the vertices a chain has at the same height
+        runs = np.flatnonzero(np.r_[True, self._keys[1:] != self._keys[:-1]])
+        run_ids = np.cumsum(np.r_[True, self._keys[1:] != self._keys[:-1]]) - 1
+        self._run_left = np.minimum.reduceat(self._xs, runs)[run_ids]
+        self._run_right = np.maximum.reduceat(self._xs, runs)[run_ids]
+        # For locate: where every chain starts in the flat arrays, and views of the arrays that
+        # give Python numbers without copying them
+        self._chain_starts = np.r_[0, np.cumsum(lengths)].tolist()
+        self._views = [memoryview(np.ascontiguousarray(array)) for array in
+                       (self._xs, self._ys, self._run_left, self._run_right)]
+
+    def locate(self, point):
+        # Returns i when the point lies between chains i and i + 1 (-1 and len(chains) - 1
+        # are the outer faces), VERTEX or EDGE, or OUTSIDE when it is outside the y span.
+        if (point.x, point.y) in self._vertex_set:
+            return VERTEX
+        if not self.chains or not self.bottom <= point.y <= self.top:
+            return OUTSIDE
+
+        low, high = 0, len(self.chains)
+        while low < high:
+            middle = (low + high) // 2
+            side = self._side(middle, point)
+            if side == 0:
+                return EDGE
+            if side > 0:
+                high = middle
+            else:
+                low = middle + 1
+        return low - 1
 
-    adjust_edge_weights(vertices, edges, in_edges, out_edges)
-    chains = create_chains(vertices, out_edges)
-    chain = locate_point(point, chains)
-    show_graph(point, vertices, edges, chains, chain)
+    def _side(self, number, point):
+        # > 0 if the point is to the left of the chain, < 0 if to the right, 0 if on it. The
+        # vertices of a chain are sorted by y, so its edge at the height of the point is found
+        # by a binary search in its own part of the flat arrays.
+        xs, ys, run_left, run_right = self._views
+        i = bisect.bisect_left(ys, point.y, self._chain_starts[number], self._chain_starts[number + 1])
+        if ys[i] == point.y:
+            # The chain passes this height through a vertex or a run of horizontal edges
+            if point.x < run_left[i]:
+                return run_left[i] - point.x
+            if point.x > run_right[i]:
+                return run_right[i] - point.x
+            return 0
 
+        start_x, start_y, end_x, end_y = xs[i - 1], ys[i - 1], xs[i], ys[i]
+        return (end_x - start_x) * (point.y - start_y) - (end_y - start_y) * (point.x - start_x)
 
-def adjust_edge_weights(vertices, edges, in_edges, out_edges):
-    assign_edges_to_vertices(vertices, edges, in_edges, out_edges)
+    def locate_many(self, xs, ys):
+        # Vectorized locate: an int array of chain indices, VERTEX, EDGE or OUTSIDE
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        result = np.full(xs.shape, OUTSIDE, dtype=np.int64)
+        if not self.chains:
+            result[np.isin(xs + 1j * ys, self._vertex_keys)] = VERTEX
+            return result
 
-    balance_bottom_up(vertices, in_edges, out_edges)
+        inside = (self.bottom <= ys) & (ys <= self.top)
+        vertex = inside & np.isin(xs + 1j * ys, self._vertex_keys)
+        result[vertex] = VERTEX
 
-    balance_top_down(vertices, in_edges, out_edges)
+        active = np.flatnonzero(inside & ~vertex)
+        qx, qy = xs[active], ys[active]
+        ranks = np.searchsorted(self._levels, qy)
+        low = np.zeros(active.size, dtype=np.int64)
+        high = np.full(active.size, len(self.chains), dtype=np.int64)
 
-    for edge in edges:
-        print(f"Edge from {edge.start} to {edge.end} has weight: {edge.weight}")
+        while active.size:
+            middle = (low + high) // 2
+            side = self._sides(middle, qx, qy, ranks)
 
+            on_edge = side == 0
+            result[active[on_edge]] = EDGE
+            high = np.where(side > 0, middle, high)
+            low = np.where(side < 0, middle + 1, low)
 
-def assign_edges_to_vertices(vertices, edges, in_edges, out_edges):
-    for edge in edges:
-        start_point = vertices.index(edge.start)
-        end_point = vertices.index(edge.end)
-        out_edges[start_point].append(edge)
-        in_edges[end_point].append(edge)
-
-
-def balance_bottom_up(vertices, in_edges, out_edges):
-    n = len(vertices)
-    for i in range(1, n - 1):
-        in_weight = calculate_weight(in_edges[i])
-        out_weight = calculate_weight(out_edges[i])
-        out_edges[i] = sort(out_edges[i])
-        if in_weight > out_weight:
-            out_edges[i][0].weight = in_weight - out_weight + 1
+            finished = ~on_edge & (low >= high)
+            result[active[finished]] = low[finished] - 1
 
+            keep = ~on_edge & ~finished
+            active, qx, qy, ranks = active[keep], qx[keep], qy[keep], ranks[keep]
+            low, high = low[keep], high[keep]
 
-def balance_top_down(vertices, in_edges, out_edges):
-    n = len(vertices)
-    for i in range(n - 1, 1, -1):
-        in_weight = calculate_weight(in_edges[i])
-        out_weight = calculate_weight(out_edges[i])
-        in_edges[i] = sort(in_edges[i])
-        if out_weight > in_weight:
-            in_edges[i][0].weight = out_weight - in_weight + in_edges[i][0].weight
+        return result
 
+    def _sides(self, numbers, xs, ys, ranks):
+        # _side for many points at once, each against its own chain
+        keys = numbers * len(self._levels) + ranks
+        i = np.searchsorted(self._keys, keys)
+        # The query height is the height of a vertex of this chain
+        exact = (self._keys[i] == keys) & (self._levels[ranks] == ys)
 
-def calculate_weight(edges):
-    return sum(edge.weight for edge in edges)
+        left, right = self._run_left[i], self._run_right[i]
+        run_side = np.where(xs < left, left - xs, np.where(xs > right, right - xs, 0.0))
 
+        start = np.maximum(i - 1, 0)
+        start_x, start_y, end_x, end_y = self._xs[start], self._ys[start], self._xs[i], self._ys[i]
+        edge_side = (end_x - start_x) * (ys - start_y) - (end_y - start_y) * (xs - start_x)
 
-def sort(edges):
-    return sorted(edges, key=lambda edge: edge.rotation, reverse=True)
+        return np.where(exact, run_side, edge_side)
 
 
-def print_chains(vertices, chains):
-    for i, chain in enumerate(chains):
-        print(f"Chain {i}: {vertices.index(chain[0].start)}", end="")
-        for edge in chain:
-            print(f" {vertices.index(edge.end)}", end="")
-        print()
+def balance_edge_weights(graph):
+    weights = graph.weights.tolist()
 
+    balance_bottom_up(graph, weights)
 
-def create_chains(vertices, edges_out):
-    chains = [[] for _ in range(calculate_weight(edges_out[0]))]
-    ordered_edges_out = [sort(v) for v in edges_out]
+    balance_top_down(graph, weights)
 
-    for j in range(len(chains)):
-        current_vertex_index = 0
-        num_vertices = len(vertices)
+    return weights
+
+
+def adjust_edge_weights(graph):
+    weights = balance_edge_weights(graph)
+
+    for edge, weight in zip(graph.edges, weights):
+        print(f"Edge from {edge.start} to {edge.end} has weight: {weight}")
+
+    return weights
 
-        while current_vertex_index != num_vertices - 1:
-            for edge in ordered_edges_out[current_vertex_index]:
-                if edge.weight > 0:
-                    chains[j].append(edge)
-                    edge.weight -= 1
-                    current_vertex_index = vertices.index(edge.end)
-                    break
-            else:
-                break
 
-    print_chains(vertices, chains)
+# The CSR lists of the graph are already sorted by rotation, so the first edge of a vertex is
+# the leftmost one and every pass below is O(V + E).
+
+def balance_bottom_up(graph, weights):
+    in_offsets, in_edges = graph.in_offsets.tolist(), graph.in_edges.tolist()
+    out_offsets, out_edges = graph.out_offsets.tolist(), graph.out_edges.tolist()
+    for i in range(1, len(graph) - 1):
+        in_weight = calculate_weight(weights, in_edges[in_offsets[i]:in_offsets[i + 1]])
+        out_weight = calculate_weight(weights, out_edges[out_offsets[i]:out_offsets[i + 1]])
+        if in_weight > out_weight:
+            weights[out_edges[out_offsets[i]]] += in_weight - out_weight
+
+
+def balance_top_down(graph, weights):
+    in_offsets, in_edges = graph.in_offsets.tolist(), graph.in_edges.tolist()
+    out_offsets, out_edges = graph.out_offsets.tolist(), graph.out_edges.tolist()
+    for i in range(len(graph) - 2, 0, -1):
+        in_weight = calculate_weight(weights, in_edges[in_offsets[i]:in_offsets[i + 1]])
+        out_weight = calculate_weight(weights, out_edges[out_offsets[i]:out_offsets[i + 1]])
+        if out_weight > in_weight:
+            weights[in_edges[in_offsets[i]]] += out_weight - in_weight
 
+
+def calculate_weight(weights, edges):
+    return sum(weights[edge] for edge in edges)
+
+
+def print_chains(graph, chains):
+    starts, ends = graph.starts.tolist(), graph.ends.tolist()
+    for i, chain in enumerate(chains):
+        print(f"Chain {i}: {starts[chain[0]]}", end="")
+        for edge in chain:
+            print(f" {ends[edge]}", end="")
+        print()
+
+
+def create_chains(graph, weights):
+    # Chains are lists of edge ids, from the bottom vertex to the top one
+    timer = stats.start()
+    out_offsets, out_edges = graph.out_offsets.tolist(), graph.out_edges.tolist()
+    ends = graph.ends.tolist()
+    weights = list(weights)
+    top = len(graph) - 1
+    # Position of the leftmost outgoing edge of every vertex that still has weight left
+    current = out_offsets[:-1]
+
+    chains = [[] for _ in range(calculate_weight(weights, out_edges[out_offsets[0]:out_offsets[1]]))]
+    for chain in chains:
+        vertex = 0
+        while vertex != top:
+            while current[vertex] < out_offsets[vertex + 1] and weights[out_edges[current[vertex]]] == 0:
+                current[vertex] += 1
+            if current[vertex] == out_offsets[vertex + 1]:
+                break
+            edge = out_edges[current[vertex]]
+            chain.append(edge)
+            weights[edge] -= 1
+            vertex = ends[edge]
+
+    if stats.enabled:
+        lengths = [len(chain) for chain in chains]
+        stats.record('create_chains', timer, {'longest': max(lengths, default=0), 'shortest': min(lengths, default=0)},
+                     chains=len(chains), edges=sum(lengths))
     return chains
 
 
-def locate_point(point, chains):
+def locate_point(point, graph, chains):
+    edges = graph.edges
     for p, chain in enumerate(chains):
-        for edge in chain:
+        for edge in (edges[i] for i in chain):
             if edge.start.y <= point.y <= edge.end.y:
                 point_vector = Point(point.x - edge.start.x, point.y - edge.start.y)
                 edge_vector = Point(edge.end.x - edge.start.x, edge.end.y - edge.start.y)
@@ -121,9 +282,8 @@ def check_edge(point: Point, edges: list):
     for edge in edges:
         edge_end = edge.end
         edge_start = edge.start
-        start_to_point = Point(point.x - edge_start.x, point.y - edge_start.y)
-        start_to_end = Point(edge_end.x - edge_start.x, edge_end.y - edge_start.y)
-        cross_product = start_to_point.x * start_to_end.y - start_to_point.y * start_to_end.x
+        cross_product = (point.x - edge_start.x) * (edge_end.y - edge_start.y) \
+            - (point.y - edge_start.y) * (edge_end.x - edge_start.x)
 
         if abs(cross_product) < 1e-9 and min(edge_start.x, edge_end.x) <= point.x <= max(edge_start.x, edge_end.x) \
                 and min(edge_start.y, edge_end.y) <= point.y <= max(edge_start.y, edge_end.y):
@@ -133,48 +293,31 @@ def check_edge(point: Point, edges: list):
     return False
 
 
-def show_graph(point, vertices, edges, chains, chain):
-    plt.scatter(point.x, point.y, color='green')
+def show_graph(axes, point, graph, chains, chain):
+    axes.scatter(point.x, point.y, color='green')
 
-    for vertex in vertices:
-        plt.scatter(vertex.x, vertex.y, color='black')
-        plt.text(vertex.x, vertex.y, f'{vertex}', fontsize=12, ha='right')
+    for vertex in graph.vertices:
+        axes.scatter(vertex.x, vertex.y, color='black')
+        axes.text(vertex.x, vertex.y, f'{vertex}', fontsize=12, ha='right')
 
-    for edge in edges:
+    for edge in graph.edges:
         start = edge.start
         end = edge.end
-        plt.plot([start.x, end.x], [start.y, end.y], 'b-')
-
-    show_chain(chains, chain)
-    show_chain(chains, chain + 1)
-
-    plt.xlabel('X')
-    plt.ylabel('Y')
-    plt.grid(True)
-    plt.show()
-
+        axes.plot([start.x, end.x], [start.y, end.y], 'b-')
 
-def show_chain(chains, number):
-    for i in range(len(chains[number])):
-        start = chains[number][i].start
-        end = chains[number][i].end
+    show_chain(axes, graph, chains, chain)
+    show_chain(axes, graph, chains, chain + 1)
 
-        plt.plot([start.x, end.x],
-                 [start.y, end.y],
-                 'red')
+    axes.set_xlabel('X')
+    axes.set_ylabel('Y')
+    axes.grid(True)
 
 
-def is_regularized_graph(vertices: list, edges: list) -> bool:
-    degree_count = {}
-    for vertex in vertices:
-        degree_count[vertex] = 0
-
-    for edge in edges:
-        degree_count[edge.start] += 1
-        degree_count[edge.end] += 1
+def show_chain(axes, graph, chains, number):
+    for i in chains[number]:
+        start = graph.edges[i].start
+        end = graph.edges[i].end
 
-    first_degree = degree_count[vertices[0]]
-    for degree in degree_count.values():
-        if degree != first_degree:
-            return True
-    return False
+        axes.plot([start.x, end.x],
+                  [start.y, end.y],
+                  'red')
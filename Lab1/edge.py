@@ -1,12 +1,16 @@
 import math
 
-from point import Point
+from .point import Point
 
 
 class Edge:
+    # start_id and end_id are the ids of the endpoints among the sorted vertices of a Graph,
+    # set on the edges a Graph makes
 
-    def __init__(self, start: Point, end: Point, weight: int):
+    def __init__(self, start: Point, end: Point, weight: int, start_id: int = None, end_id: int = None):
         self.start = start
         self.end = end
         self.weight = weight
+        self.start_id = start_id
+        self.end_id = end_id
         self.rotation = math.atan2(end.y - start.y, end.x - start.x)
@@ -0,0 +1,72 @@
+import numpy as np
+
+from .edge import Edge
+from .point import Point
+
+
+class Graph:
+    # Planar graph with vertices sorted from bottom to top by y (then by x) and edges directed upwards.
+    # Edges incident to vertex v are stored in CSR form: out_edges[out_offsets[v]:out_offsets[v + 1]]
+    # (and the same for in_edges) hold edge ids sorted by rotation in descending order.
+
+    def __init__(self, xs, ys, starts, ends, weights=None):
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+
+        # order[i] is the original id of the i-th vertex from the bottom
+        self.order = np.lexsort((xs, ys))
+        rank = np.empty_like(self.order)
+        rank[self.order] = np.arange(len(self.order))
+        starts, ends = rank[starts], rank[ends]
+
+        self.xs = xs[self.order]
+        self.ys = ys[self.order]
+        self.starts = np.minimum(starts, ends)
+        self.ends = np.maximum(starts, ends)
+        self.weights = np.ones(len(starts), dtype=np.int64) if weights is None else np.asarray(weights)
+        self.rotations = np.arctan2(self.ys[self.ends] - self.ys[self.starts], self.xs[self.ends] - self.xs[self.starts])
+
+        self.out_offsets, self.out_edges = adjacency(len(self.xs), self.starts, self.rotations)
+        self.in_offsets, self.in_edges = adjacency(len(self.xs), self.ends, self.rotations)
+
+        self._vertices = None
+        self._edges = None
+
+    @classmethod
+    def from_points(cls, vertices, edges):
+        # Graph of the Point and Edge lists of read_vertices and read_edges. The Points are kept
+        # as the vertices; the edges are made anew, directed upwards and with the sorted vertex
+        # ids, and the input Edges are left as they are.
+        index = {vertex: i for i, vertex in enumerate(vertices)}
+        graph = cls([vertex.x for vertex in vertices], [vertex.y for vertex in vertices],
+                    [index[edge.start] for edge in edges], [index[edge.end] for edge in edges],
+                    [edge.weight for edge in edges])
+        graph._vertices = [vertices[i] for i in graph.order.tolist()]
+        return graph
+
+    @property
+    def vertices(self):
+        if self._vertices is None:
+            self._vertices = [Point(x, y) for x, y in zip(self.xs.tolist(), self.ys.tolist())]
+        return self._vertices
+
+    @property
+    def edges(self):
+        if self._edges is None:
+            vertices = self.vertices
+            self._edges = [Edge(vertices[start], vertices[end], weight, start, end)
+                           for start, end, weight in zip(self.starts.tolist(), self.ends.tolist(), self.weights.tolist())]
+        return self._edges
+
+    def __len__(self):
+        return len(self.xs)
+
+
+def adjacency(count, ids, rotations):
+    # CSR offsets and edge ids grouped by vertex, one lexsort for the whole graph
+    order = np.lexsort((-rotations, ids))
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ids, minlength=count), out=offsets[1:])
+    return offsets, order
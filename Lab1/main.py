@@ -1,20 +1,23 @@
-import chain_method
-import read_data
-from point import Point
+import os
+import sys
 
-file_edges = 'edges.txt'
-file_vertices = 'vertices.txt'
+from . import chain_method, read_data
+from .point import Point
 
-# Read data
-initial_vertices = read_data.read_vertices(file_vertices)
-edges = read_data.read_edges(file_edges, initial_vertices)
+# Run from the repository root as python -m Lab1.main [file]
+directory = os.path.dirname(os.path.abspath(__file__))
+file_edges = os.path.join(directory, 'edges.txt')
+file_vertices = os.path.join(directory, 'vertices.txt')
+
+# Read data, vertices are sorted from bottom to top by y
+if len(sys.argv) > 1:
+    graph = read_data.load_graph(sys.argv[1])
+else:
+    graph = read_data.read_graph(file_vertices, file_edges)
 
 # point = Point(13, 13)
 # point = Point(12, 14)
 point = Point(10, 13)
 
-# Sort vertices from bottom to top by y
-vertices = sorted(initial_vertices, key=lambda p: p.y)
-
 # Locate the point
-chain_method.find_point(vertices, edges, point)
+chain_method.find_point(graph, point, render=True)
@@ -1,26 +1,29 @@
-from edge import Edge
-from point import Point
+import numpy as np
+
+from geometry import binary, loader
+
+from .edge import Edge
+from .graph import Graph
+from .point import Point
 
 
 def read_vertices(file_name: str) -> list:
-    points = []
-    with open(file_name, 'r') as file:
-        for line in file:
-            x_str, y_str = line.strip().split()
-            x = int(x_str)
-            y = int(y_str)
-            points.append(Point(x, y))
-    return points
+    return [Point(x, y) for x, y in loader.read_array(file_name, 2, np.int64).tolist()]
 
 
 def read_edges(file_name: str, points: list) -> list:
-    edges = []
-    with open(file_name, 'r') as file:
-        for line in file:
-            start_index_str, end_index_str = line.strip().split()
-            start_index = int(start_index_str)
-            end_index = int(end_index_str)
-            start_point = points[start_index]
-            end_point = points[end_index]
-            edges.append(Edge(start_point, end_point, 1))
-    return edges
+    return [Edge(points[start_index], points[end_index], 1)
+            for start_index, end_index in loader.read_array(file_name, 2, np.int64).tolist()]
+
+
+def read_graph(file_vertices: str, file_edges: str) -> Graph:
+    # Builds the graph straight from the arrays, Point and Edge objects are only made on demand
+    vertices = loader.read_array(file_vertices, 2, np.int64)
+    edges = loader.read_array(file_edges, 2, np.int64)
+    return Graph(vertices[:, 0], vertices[:, 1], edges[:, 0], edges[:, 1])
+
+
+def load_graph(file_name: str) -> Graph:
+    # Binary graph file, the arrays are memory-mapped
+    _, (vertices, edges) = binary.read(file_name, binary.GRAPH)
+    return Graph(vertices[:, 0], vertices[:, 1], edges[:, 0], edges[:, 1])
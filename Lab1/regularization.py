@@ -0,0 +1,108 @@
+import numpy as np
+from sortedcontainers import SortedList
+
+from .graph import Graph
+
+
+def is_regular(graph: Graph) -> bool:
+    # Every vertex except the bottom one needs an incoming edge, every vertex except the top one an outgoing edge
+    in_degrees = np.diff(graph.in_offsets)
+    out_degrees = np.diff(graph.out_offsets)
+    return bool(np.all(in_degrees[1:] > 0) and np.all(out_degrees[:-1] > 0))
+
+
+def regularize(graph: Graph):
+    # Adds the missing edges with two plane sweeps, bottom to top and then top to bottom,
+    # O(n log n) in total. Returns the regular graph and the number of added edges.
+    xs, ys = graph.xs.tolist(), graph.ys.tolist()
+    starts, ends = graph.starts.tolist(), graph.ends.tolist()
+    n = len(xs)
+
+    added = sweep(xs, ys, starts, ends)
+    starts += [start for start, _ in added]
+    ends += [end for _, end in added]
+
+    # The second sweep runs on the graph mirrored by y, so vertex i becomes vertex n - 1 - i
+    mirrored = sweep(xs[::-1], [-y for y in reversed(ys)], [n - 1 - end for end in ends], [n - 1 - start for start in starts])
+    added += [(n - 1 - end, n - 1 - start) for start, end in mirrored]
+    starts += [n - 1 - end for _, end in mirrored]
+    ends += [n - 1 - start for start, _ in mirrored]
+
+    weights = np.concatenate((graph.weights, np.ones(len(added), dtype=np.int64)))
+    return Graph(graph.xs, graph.ys, starts, ends, weights), len(added)
+
+
+def sweep(xs, ys, starts, ends):
+    # Connects every vertex without incoming edges to the helper of the interval it falls in:
+    # the last vertex the sweep line met between the same two edges, which is visible from it.
+    # Vertices must be sorted by y and edges directed upwards.
+    in_edges = [[] for _ in xs]
+    out_edges = [[] for _ in xs]
+    for edge, (start, end) in enumerate(zip(starts, ends)):
+        in_edges[end].append(edge)
+        out_edges[start].append(edge)
+
+    line = SweepLine()
+    status = SortedList()
+    segments = {}
+    # The interval to the right of a status edge (None for the leftmost one) maps to its helper
+    helpers = {None: 0}
+    added = []
+
+    for vertex in range(len(xs)):
+        line.y = ys[vertex]
+        for edge in in_edges[vertex]:
+            if edge in segments:
+                status.remove(segments.pop(edge))
+
+        position = status.bisect_left(StatusSegment(line, -1, xs[vertex], ys[vertex], xs[vertex], ys[vertex]))
+        left = status[position - 1].edge if position > 0 else None
+        if vertex > 0 and not in_edges[vertex]:
+            added.append((helpers[left], vertex))
+        helpers[left] = vertex
+
+        for edge in out_edges[vertex]:
+            end = ends[edge]
+            if ys[end] != ys[vertex]:
+                segments[edge] = StatusSegment(line, edge, xs[vertex], ys[vertex], xs[end], ys[end])
+                status.add(segments[edge])
+                helpers[edge] = vertex
+
+    return added
+
+
+class SweepLine:
+
+    def __init__(self):
+        self.y = 0
+
+
+class StatusSegment:
+    # Non-horizontal edge ordered by its x at the current height of the sweep line; edges meeting
+    # at the same point are ordered by their slope below the point (if they end there) or above it.
+    __slots__ = ('line', 'edge', 'x0', 'y0', 'x1', 'y1', 'slope')
+
+    def __init__(self, line, edge, x0, y0, x1, y1):
+        self.line = line
+        self.edge = edge
+        self.x0 = x0
+        self.y0 = y0
+        self.x1 = x1
+        self.y1 = y1
+        self.slope = (x1 - x0) / (y1 - y0) if y1 != y0 else 0
+
+    def x_at(self, y):
+        if y == self.y0:
+            return self.x0
+        if y == self.y1:
+            return self.x1
+        return self.x0 + (y - self.y0) * self.slope
+
+    def __lt__(self, other):
+        y = self.line.y
+        x, other_x = self.x_at(y), other.x_at(y)
+        if x != other_x:
+            return x < other_x
+        if self.y1 == y:
+            return self.slope > other.slope
+        return self.slope < other.slope
@@ -1,23 +1,31 @@
 import numpy as np
 
-from point import Point
+from geometry import binary, loader
+
+from .point import Point
 
 
 def read_points(file_name: str) -> list:
-    points = []
-    with open(file_name, 'r') as file:
-        for line in file:
-            x_str, y_str = line.strip().split()
-            x = int(x_str)
-            y = int(y_str)
-            points.append(Point(x, y))
-    return points
+    xs, ys = read_point_arrays(file_name)
+    return [Point(x, y) for x, y in zip(xs.tolist(), ys.tolist())]
+
+
+def read_point_arrays(file_name: str):
+    # Text files are parsed, binary ones are memory-mapped
+    if binary.is_binary(file_name):
+        _, (points,) = binary.read(file_name, binary.POINTS)
+    else:
+        points = loader.read_array(file_name, 2, np.int64)
+    return points[:, 0], points[:, 1]
+
 
 def read_range(file_name: str):
+    if binary.is_binary(file_name):
+        _, (regions,) = binary.read(file_name, binary.RECTS)
+        return regions[0, :2], regions[0, 2:]
 
     data = np.loadtxt(file_name)
     x_values = data[0, :]
     y_values = data[1, :]
     return x_values, y_values
 
-
@@ -0,0 +1,171 @@
+import numpy as np
+
+from .range_tree import KDTree
+
+# deleted_at of a point that is still alive
+ALIVE = np.iinfo(np.int64).max
+
+
+class DynamicTree:
+    # Dynamic version of the k-d tree by the logarithmic method (Bentley–Saxe). New points go to
+    # a buffer; a full buffer is merged with the levels 0, 1, ... up to the first empty one into
+    # a static KDTree on that level, so level i holds at most buffer_size * 2 ** i points and an
+    # insert costs amortized O(log^2 n). Deletes are tombstones; once the deleted points exceed
+    # compact_ratio of the stored ones, compact() rebuilds the levels and frees their storage.
+    #
+    # A point lives in a slot of the arrays, and the id returned by insert maps to its slot, as
+    # compact() moves the live points to the first slots. compact() makes new arrays and lists,
+    # so snapshots keep reading the ones they were taken on.
+
+    def __init__(self, buffer_size=1024, compact_ratio=0.25):
+        self.buffer_size = buffer_size
+        self.compact_ratio = compact_ratio
+        # points[slot], and the id of the point in every slot
+        self.points = []
+        self._ids = np.empty(buffer_size, dtype=np.int64)
+        # Slots of the live points by id
+        self.slots = {}
+        self.next_id = 0
+        # levels[i] is None or a KDTree with the slots of its points
+        self.levels = []
+        self.buffer = {}
+        self.version = 0
+        self._xs = np.empty(buffer_size)
+        self._ys = np.empty(buffer_size)
+        self._deleted_at = np.empty(buffer_size, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.slots)
+
+    def insert(self, point):
+        # Returns the id of the point, used to delete it
+        slot = len(self.points)
+        if slot == len(self._xs):
+            self._resize(2 * slot)
+        point_id = self.next_id
+        self.next_id += 1
+        self.points.append(point)
+        self._xs[slot] = point.x
+        self._ys[slot] = point.y
+        self._deleted_at[slot] = ALIVE
+        self._ids[slot] = point_id
+        self.slots[point_id] = slot
+
+        self.buffer[slot] = None
+        if len(self.buffer) >= self.buffer_size:
+            self._merge()
+        return point_id
+
+    def delete(self, point_id):
+        # Deleting a point twice does nothing, an id that insert never returned raises KeyError
+        if not 0 <= point_id < self.next_id:
+            raise KeyError(point_id)
+        slot = self.slots.pop(point_id, None)
+        if slot is None:
+            return
+        self.version += 1
+        self._deleted_at[slot] = self.version
+        self.buffer.pop(slot, None)
+        if len(self.points) - len(self.slots) > self.compact_ratio * len(self.points):
+            self.compact()
+
+    def compact(self):
+        # Moves the live points to the first slots of new arrays and rebuilds the points of the
+        # levels into one level
+        stored = self._alive([level[1] for level in self.levels if level])
+        buffered = np.fromiter(self.buffer, dtype=np.int64)
+        live = np.concatenate((stored, buffered))
+        points = self.points
+        self.points = [points[slot] for slot in live.tolist()]
+        capacity = max(self.buffer_size, 2 * len(live))
+        for name in ('_xs', '_ys', '_ids'):
+            old = getattr(self, name)
+            setattr(self, name, np.empty(capacity, dtype=old.dtype))
+            getattr(self, name)[:len(live)] = old[live]
+        self._deleted_at = np.full(capacity, ALIVE, dtype=np.int64)
+        self.slots = dict(zip(self._ids[:len(live)].tolist(), range(len(live))))
+
+        self.levels = []
+        self.buffer = dict.fromkeys(range(len(stored), len(live)))
+        if len(stored):
+            self._store(self._level_of(len(stored)), np.arange(len(stored)))
+
+    def snapshot(self):
+        # Read-only view of the current points; later inserts and deletes do not change it
+        return Snapshot(self, list(self.levels), np.fromiter(self.buffer, dtype=np.int64), self.version)
+
+    def query(self, x_range, y_range):
+        return self.snapshot().query(x_range, y_range)
+
+    def count(self, x_range, y_range):
+        return self.snapshot().count(x_range, y_range)
+
+    def iter_points(self, x_range, y_range):
+        return self.snapshot().iter_points(x_range, y_range)
+
+    def _resize(self, capacity):
+        # New arrays, so snapshots keep the old ones
+        self._xs = np.resize(self._xs, capacity)
+        self._ys = np.resize(self._ys, capacity)
+        self._ids = np.resize(self._ids, capacity)
+        self._deleted_at = np.resize(self._deleted_at, capacity)
+
+    def _merge(self):
+        parts = [np.fromiter(self.buffer, dtype=np.int64)]
+        level = 0
+        while level < len(self.levels) and self.levels[level]:
+            parts.append(self.levels[level][1])
+            self.levels[level] = None
+            level += 1
+        self.buffer = {}
+
+        slots = self._alive(parts)
+        if len(slots):
+            self._store(max(level, self._level_of(len(slots))), slots)
+
+    def _store(self, level, slots):
+        while len(self.levels) <= level:
+            self.levels.append(None)
+        self.levels[level] = (KDTree(self._xs[slots], self._ys[slots]), slots)
+
+    def _level_of(self, count):
+        # Lowest level that can hold count points
+        return max(0, -(-count // self.buffer_size) - 1).bit_length()
+
+    def _alive(self, parts):
+        slots = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        return slots[self._deleted_at[slots] == ALIVE]
+
+
+class Snapshot:
+
+    def __init__(self, tree, levels, buffer, version):
+        # The arrays and the list of points of the tree at this moment
+        self.points = tree.points
+        self.xs, self.ys, self.ids, self.deleted_at = tree._xs, tree._ys, tree._ids, tree._deleted_at
+        self.levels = levels
+        self.buffer = buffer
+        self.version = version
+
+    def query(self, x_range, y_range):
+        # Ids of the points strictly inside the rectangle
+        return self.ids[self._slots(x_range, y_range)]
+
+    def count(self, x_range, y_range):
+        return len(self._slots(x_range, y_range))
+
+    def iter_points(self, x_range, y_range):
+        points = self.points
+        for slot in self._slots(x_range, y_range).tolist():
+            yield points[slot]
+
+    def _slots(self, x_range, y_range):
+        xs, ys = self.xs[self.buffer], self.ys[self.buffer]
+        inside = (x_range[0] < xs) & (xs < x_range[1]) & (y_range[0] < ys) & (ys < y_range[1])
+        found = [self.buffer[inside]]
+        for level in self.levels:
+            if level:
+                kd_tree, slots = level
+                found.append(slots[kd_tree.query(x_range, y_range)])
+        slots = np.concatenate(found)
+        return slots[self.deleted_at[slots] > self.version]
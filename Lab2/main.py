@@ -1,12 +1,27 @@
-import data
-import range_tree
-import plots as pl
+import os
+import sys
 
-points = data.read_points("points.txt")
-x, y = data.read_range("region.txt")
+from geometry import plotting
+from geometry.core import PointArray
 
-tree = range_tree.build_tree(points)
-pl.draw_tree(tree)
+from . import data, range_tree
+from . import plots as pl
+
+# Run from the repository root as python -m Lab2.main [points file] [region file]
+directory = os.path.dirname(os.path.abspath(__file__))
+points_file = sys.argv[1] if len(sys.argv) > 1 else os.path.join(directory, "points.txt")
+region_file = sys.argv[2] if len(sys.argv) > 2 else os.path.join(directory, "region.txt")
+
+# The tree is built from the (memory-mapped) coordinate arrays; Points are made only to draw
+xs, ys = data.read_point_arrays(points_file)
+points = PointArray(xs, ys)
+x, y = data.read_range(region_file)
+# True shows the tree and the result, False runs headless, or an observer from geometry.plotting
+observer = plotting.observer(True)
+
+tree = range_tree.KDTree(xs, ys).root
+if observer:
+    observer(pl.draw_tree, tree)
 
 result = range_tree.search_points(tree, x, y, [])
 if len(result) == 0:
@@ -14,4 +29,5 @@ if len(result) == 0:
 else:
     print("Точки всередині регіону:", result)
 
-pl.show_points(points, x, y, result)
+if observer:
+    observer(pl.show_points, points, x, y, result)
@@ -0,0 +1,212 @@
+import heapq
+
+import numpy as np
+
+from .range_tree import Node
+
+# Subtrees with at most this many points are compared with all batch queries at once
+LEAF_SIZE = 32
+
+
+def knn(tree, q, k):
+    # The k points nearest to q = (x, y), nearest first. Best-first search: subtrees are visited
+    # in the order of the distance from q to their bounding box and the search stops once that
+    # distance exceeds the k-th best one, O(log n + k) expected.
+    tree = kd_tree(tree)
+    qx, qy = float(q[0]), float(q[1])
+    best = []
+    heap = [(0.0, 0, len(tree))] if len(tree) and k > 0 else []
+    while heap:
+        distance, low, high = heapq.heappop(heap)
+        if len(best) == k and distance > -best[0][0]:
+            break
+        middle = middle_of(low, high)
+        point_distance = (float(tree.xs[middle]) - qx) ** 2 + (float(tree.ys[middle]) - qy) ** 2
+        if len(best) < k:
+            heapq.heappush(best, (-point_distance, middle))
+        elif point_distance < -best[0][0]:
+            heapq.heapreplace(best, (-point_distance, middle))
+        for child_low, child_high in ((low, middle), (middle + 1, high)):
+            if child_low < child_high:
+                child = middle_of(child_low, child_high)
+                heapq.heappush(heap, (point_box_distance(tree, child, qx, qy), child_low, child_high))
+
+    return [tree.point_at(middle) for _, middle in sorted(best, reverse=True)]
+
+
+def radius(tree, q, r):
+    # All points within distance r of q = (x, y); subtrees entirely inside the circle are
+    # reported without looking at their points
+    tree = kd_tree(tree)
+    qx, qy = float(q[0]), float(q[1])
+    limit = r * r
+    found = []
+    stack = [(0, len(tree))] if len(tree) else []
+    while stack:
+        low, high = stack.pop()
+        middle = middle_of(low, high)
+        if point_box_distance(tree, middle, qx, qy) > limit:
+            continue
+        if float(box_farthest(tree, middle, qx, qy)) <= limit:
+            found.append((low, high))
+            continue
+        if (tree.xs[middle] - qx) ** 2 + (tree.ys[middle] - qy) ** 2 <= limit:
+            found.append((middle, middle + 1))
+        if middle + 1 < high:
+            stack.append((middle + 1, high))
+        if low < middle:
+            stack.append((low, middle))
+
+    return list(tree.points_in(found))
+
+
+def knn_many(tree, qs, k):
+    # knn for an (m, 2) array of query points. Returns (m, k) arrays of distances and point
+    # indices, nearest first, padded with inf and -1 when the tree has fewer than k points.
+    # Every query first gets an upper bound on its k-th distance from the points around the leaf
+    # it falls into; then the tree is walked once for all queries, with the queries that can
+    # still improve in a subtree handled together by NumPy.
+    tree = kd_tree(tree)
+    qs = np.asarray(qs, dtype=np.float64).reshape(-1, 2)
+    distances = np.full((len(qs), k), np.inf)
+    positions = np.full((len(qs), k), -1, dtype=np.int64)
+    if len(tree) and len(qs) and k > 0:
+        bound = initial_bound(tree, qs, k)
+        knn_visit(tree, 0, len(tree), 0, np.arange(len(qs)), qs, bound, distances, positions)
+    indices = np.full(positions.shape, -1, dtype=np.int64)
+    found = positions >= 0
+    indices[found] = tree.index[positions[found]]
+    return np.sqrt(distances), indices
+
+
+def radius_many(tree, qs, r):
+    # radius for an (m, 2) array of query points, in CSR form: the indices of the points within
+    # r of qs[i] are indices[offsets[i]:offsets[i + 1]]
+    tree = kd_tree(tree)
+    qs = np.asarray(qs, dtype=np.float64).reshape(-1, 2)
+    pairs = []
+    if len(tree) and len(qs):
+        radius_visit(tree, 0, len(tree), np.arange(len(qs)), qs, r * r, pairs)
+
+    queries = np.concatenate([query for query, _ in pairs]) if pairs else np.empty(0, dtype=np.int64)
+    found = np.concatenate([position for _, position in pairs]) if pairs else np.empty(0, dtype=np.int64)
+    order = np.argsort(queries, kind='stable')
+    offsets = np.zeros(len(qs) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(queries, minlength=len(qs)), out=offsets[1:])
+    return offsets, tree.index[found[order]]
+
+
+def kd_tree(tree):
+    return tree.tree if isinstance(tree, Node) else tree
+
+
+def middle_of(low, high):
+    return low + (high - low - 1) // 2
+
+
+def box_distance(tree, middle, qx, qy):
+    # Squared distance from the query to the bounding box of the subtree; works on arrays too
+    dx = np.maximum(np.maximum(tree.min_x[middle] - qx, qx - tree.max_x[middle]), 0)
+    dy = np.maximum(np.maximum(tree.min_y[middle] - qy, qy - tree.max_y[middle]), 0)
+    return dx * dx + dy * dy
+
+
+def point_box_distance(tree, middle, qx, qy):
+    # box_distance for a single query without NumPy scalar arithmetic
+    dx = max(float(tree.min_x[middle]) - qx, qx - float(tree.max_x[middle]), 0.0)
+    dy = max(float(tree.min_y[middle]) - qy, qy - float(tree.max_y[middle]), 0.0)
+    return dx * dx + dy * dy
+
+
+def box_farthest(tree, middle, qx, qy):
+    dx = np.maximum(qx - tree.min_x[middle], tree.max_x[middle] - qx)
+    dy = np.maximum(qy - tree.min_y[middle], tree.max_y[middle] - qy)
+    return dx * dx + dy * dy
+
+
+def initial_bound(tree, qs, k):
+    # Walks every query down to a subtree of at most `window` points; the k-th distance to the
+    # `window` points around it is an upper bound of the true k-th distance
+    n = len(tree)
+    if n < k:
+        return np.full(len(qs), np.inf)
+    window = min(n, max(k, LEAF_SIZE))
+    low = np.zeros(len(qs), dtype=np.int64)
+    high = np.full(len(qs), n, dtype=np.int64)
+    depth = 0
+    while True:
+        active = high - low > window
+        if not active.any():
+            break
+        middle = low + (high - low - 1) // 2
+        coordinates = tree.xs if depth % 2 == 0 else tree.ys
+        go_left = qs[:, depth % 2] < coordinates[middle]
+        low = np.where(active & ~go_left, middle + 1, low)
+        high = np.where(active & go_left, middle, high)
+        depth += 1
+
+    near = np.minimum(low, n - window)[:, None] + np.arange(window)
+    squared = (tree.xs[near] - qs[:, :1]) ** 2 + (tree.ys[near] - qs[:, 1:]) ** 2
+    return np.partition(squared, k - 1, axis=1)[:, k - 1]
+
+
+def knn_visit(tree, low, high, depth, queries, qs, bound, distances, positions):
+    middle = middle_of(low, high)
+    limit = np.minimum(bound[queries], distances[queries, -1])
+    keep = box_distance(tree, middle, qs[queries, 0], qs[queries, 1]) <= limit
+    queries = queries[keep]
+    if not len(queries):
+        return
+    if high - low <= LEAF_SIZE:
+        merge_nearest(tree, low, high, queries, qs, bound, distances, positions)
+        return
+
+    merge_nearest(tree, middle, middle + 1, queries, qs, bound, distances, positions)
+    coordinates = tree.xs if depth % 2 == 0 else tree.ys
+    go_left = qs[queries, depth % 2] < coordinates[middle]
+    children = [(low, middle), (middle + 1, high)]
+    if 2 * np.count_nonzero(go_left) < len(queries):
+        children.reverse()
+    for child_low, child_high in children:
+        if child_low < child_high:
+            knn_visit(tree, child_low, child_high, depth + 1, queries, qs, bound, distances, positions)
+
+
+def merge_nearest(tree, low, high, queries, qs, bound, distances, positions):
+    # Adds the points of [low, high) to the k best of each query
+    squared = (tree.xs[low:high] - qs[queries, :1]) ** 2 + (tree.ys[low:high] - qs[queries, 1:]) ** 2
+    limit = np.minimum(bound[queries], distances[queries, -1])
+    squared[squared > limit[:, None]] = np.inf
+
+    candidates = np.concatenate((distances[queries], squared), axis=1)
+    candidate_positions = np.concatenate(
+        (positions[queries], np.broadcast_to(np.arange(low, high), squared.shape)), axis=1)
+    order = np.argsort(candidates, axis=1, kind='stable')[:, :distances.shape[1]]
+    distances[queries] = np.take_along_axis(candidates, order, axis=1)
+    positions[queries] = np.take_along_axis(candidate_positions, order, axis=1)
+
+
+def radius_visit(tree, low, high, queries, qs, limit, pairs):
+    middle = middle_of(low, high)
+    qx, qy = qs[queries, 0], qs[queries, 1]
+    near = box_distance(tree, middle, qx, qy) <= limit
+    inside = near & (box_farthest(tree, middle, qx, qy) <= limit)
+    if inside.any():
+        # Whole subtree for these queries
+        whole = queries[inside]
+        pairs.append((np.repeat(whole, high - low), np.tile(np.arange(low, high), len(whole))))
+    queries = queries[near & ~inside]
+    if not len(queries):
+        return
+
+    if high - low <= LEAF_SIZE:
+        squared = (tree.xs[low:high] - qs[queries, :1]) ** 2 + (tree.ys[low:high] - qs[queries, 1:]) ** 2
+        query, position = np.nonzero(squared <= limit)
+        pairs.append((queries[query], position + low))
+        return
+
+    squared = (tree.xs[middle] - qs[queries, 0]) ** 2 + (tree.ys[middle] - qs[queries, 1]) ** 2
+    pairs.append((queries[squared <= limit], np.full(np.count_nonzero(squared <= limit), middle)))
+    for child_low, child_high in ((low, middle), (middle + 1, high)):
+        if child_low < child_high:
+            radius_visit(tree, child_low, child_high, queries, qs, limit, pairs)
@@ -1,24 +1,22 @@
-import networkx as nx
-from matplotlib import pyplot as plt
+# Draw functions for geometry.plotting observers; networkx is imported only to draw a tree
 
 
-def show_points(points: list, x: list, y: list, result: list):
+def show_points(axes, points: list, x: list, y: list, result: list):
     x_values = [point.x for point in points]
     y_values = [point.y for point in points]
 
-    plt.scatter(x_values, y_values, color='blue')
+    axes.scatter(x_values, y_values, color='blue')
     for point in result:
-        plt.scatter(point.x, point.y, color='red')
+        axes.scatter(point.x, point.y, color='red')
 
     x1, x2 = x
     y1, y2 = y
 
-    plt.plot([x1, x2, x2, x1, x1], [y1, y1, y2, y2, y1], color='red')
+    axes.plot([x1, x2, x2, x1, x1], [y1, y1, y2, y2, y1], color='red')
 
-    plt.xlabel('x')
-    plt.ylabel('y')
-    plt.grid(True)
-    plt.show()
+    axes.set_xlabel('x')
+    axes.set_ylabel('y')
+    axes.grid(True)
 
 
 def add_nodes_edges(G, node, depth=0, pos=None):
@@ -39,9 +37,10 @@ def add_nodes_edges(G, node, depth=0, pos=None):
     return pos
 
 
-def draw_tree(tree):
+def draw_tree(axes, tree):
+    import networkx as nx
+
     G = nx.Graph()
     pos = add_nodes_edges(G, tree)
-    nx.draw(G, pos, with_labels=True, node_size=2000, node_color="skyblue", font_size=10, font_weight="bold",
-            arrows=True)
-    plt.show()
+    nx.draw(G, pos, ax=axes, with_labels=True, node_size=2000, node_color="skyblue", font_size=10,
+            font_weight="bold", arrows=True)
@@ -1,8 +1 @@
-class Point:
-
-    def __init__(self, x: int, y: int):
-        self.x = x
-        self.y = y
-
-    def __repr__(self):
-        return "(" + str(self.x) + ", " + str(self.y) + ")"
\ No newline at end of file
+from geometry.core import Point
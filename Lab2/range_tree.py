@@ -1,78 +1,395 @@
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from geometry import stats
+from geometry.core import point_columns
+
+from .point import Point
+
+
 class Node:
-    def __init__(self, point, dim):
-        self.point = point
-        self.left = None
-        self.right = None
+    # A node of KDTree: the index range [low, high) of its subtree. Nodes are not stored, they are
+    # made on demand when the tree is walked through point/left/right.
+    __slots__ = ('tree', 'low', 'high', 'dim')
+
+    def __init__(self, tree, low, high, dim):
+        self.tree = tree
+        self.low = low
+        self.high = high
         self.dim = dim
 
+    @property
+    def middle(self):
+        return self.low + (self.high - self.low - 1) // 2
+
+    @property
+    def point(self):
+        return self.tree.point_at(self.middle)
+
+    @property
+    def left(self):
+        middle = self.middle
+        return Node(self.tree, self.low, middle, 1 - self.dim) if middle > self.low else None
+
+    @property
+    def right(self):
+        middle = self.middle
+        return Node(self.tree, middle + 1, self.high, 1 - self.dim) if middle + 1 < self.high else None
+
     def __repr__(self):
         return "(" + str(self.point) + ", " + str(self.left) + "," + str(self.right)
 
 
-def sort_point(points, axis=0):
-    if axis == 0:
-        sorted_points = sorted(points, key=lambda point: point.x)
-    elif axis == 1:
-        sorted_points = sorted(points, key=lambda point: point.y)
-    return sorted_points
+class KDTree:
+    # k-d tree stored implicitly in index arrays: the points are permuted so that the node of the
+    # range [low, high) holds its median at (low + high - 1) // 2, with the left subtree in
+    # [low, median) and the right one in [median + 1, high). The split axis alternates by depth.
+    # The bounding box of every subtree is stored at the position of its median.
+    ARRAYS = ('index', 'xs', 'ys', 'min_x', 'max_x', 'min_y', 'max_y')
 
+    def __init__(self, xs, ys, points=None):
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        self.index = build_kd_order(xs, ys)
+        self.xs = xs[self.index]
+        self.ys = ys[self.index]
+        self.min_x, self.max_x = subtree_bounds(self.xs)
+        self.min_y, self.max_y = subtree_bounds(self.ys)
+        self._points = points
 
-def find_middle_point(points):
-    middle_point = (len(points) - 1) // 2
-    return middle_point
+    @classmethod
+    def from_arrays(cls, arrays):
+        # Tree over already built ARRAYS, for example ones in shared memory
+        tree = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(tree, name, arrays[name])
+        tree._points = None
+        return tree
 
+    def point_at(self, position):
+        # The point at a position of the arrays: the caller's object, or one made from the
+        # coordinates when the tree was built from arrays alone
+        if self._points is not None:
+            return self._points[self.index[position]]
+        return Point(self.xs[position].item(), self.ys[position].item())
 
-def build_tree(points, depth=0):
-    if len(points) == 0:
-        return None
+    @property
+    def root(self):
+        return Node(self, 0, len(self.index), 0) if len(self.index) else None
 
-    axis = depth % 2
-    # Сортуємо або по x або по y
-    sorted_points = sort_point(points, axis)
-    # Визначаємо медіану
-    middle_index = find_middle_point(sorted_points)
-    middle_point = sorted_points[middle_index]
-    # Ділимо точки на два масиви
-    left_points = sorted_points[:middle_index]
-    right_points = sorted_points[middle_index + 1:]
-    # Створюємо вузол
-    node = Node(middle_point, axis)
-    # Задаємо йому лівого і правого сина, які визначаємо рекурсивно викликаючи цю функцію ще раз але вже окремо для кожного з масивів
-    node.left = build_tree(left_points, depth + 1)
-    node.right = build_tree(right_points, depth + 1)
+    def __len__(self):
+        return len(self.index)
 
-    return node
+    def ranges(self, x_range, y_range, node=None):
+        # Yields position ranges [low, high) of the points strictly inside the rectangle. The tree
+        # is walked with an explicit stack; a subtree whose box lies inside the rectangle is
+        # yielded whole and one whose box misses it is skipped.
+        timer = stats.start()
+        x_low, x_high = x_range
+        y_low, y_high = y_range
+        node = node or self.root
+        stack = [(node.low, node.high)] if node else []
+        visited = whole = 0
+        while stack:
+            low, high = stack.pop()
+            visited += 1
+            middle = low + (high - low - 1) // 2
+            if self.max_x[middle] <= x_low or self.min_x[middle] >= x_high \
+                    or self.max_y[middle] <= y_low or self.min_y[middle] >= y_high:
+                continue
+            if x_low < self.min_x[middle] and self.max_x[middle] < x_high \
+                    and y_low < self.min_y[middle] and self.max_y[middle] < y_high:
+                whole += 1
+                yield low, high
+                continue
 
+            if x_low < self.xs[middle] < x_high and y_low < self.ys[middle] < y_high:
+                yield middle, middle + 1
+            if middle + 1 < high:
+                stack.append((middle + 1, high))
+            if low < middle:
+                stack.append((low, middle))
+        if stats.enabled:
+            # Subtrees reported whole are not walked, so they count as one visited node
+            stats.record('kd_tree.ranges', timer, visited=visited, whole_subtrees=whole)
 
-def check_point(point, x_range, y_range):
-    return (x_range[0] < point.x < x_range[1]) and (y_range[0] < point.y < y_range[1])
+    def count(self, x_range, y_range, node=None):
+        return sum(high - low for low, high in self.ranges(x_range, y_range, node))
 
+    def query(self, x_range, y_range, node=None):
+        # Indices of the points strictly inside the rectangle
+        found = [self.index[low:high] for low, high in self.ranges(x_range, y_range, node)]
+        return np.concatenate(found) if found else np.empty(0, dtype=self.index.dtype)
 
-def search_points(node, x_range, y_range, result):
+    def iter_points(self, x_range, y_range, node=None):
+        return self.points_in(self.ranges(x_range, y_range, node))
 
-    check(node, x_range, y_range, result, node.dim)
+    def points_in(self, ranges):
+        # Points of the position ranges [low, high); they are made only for these ranges unless
+        # the caller gave its own
+        points = self._points
+        for low, high in ranges:
+            if points is None:
+                yield from map(Point, self.xs[low:high].tolist(), self.ys[low:high].tolist())
+            else:
+                for i in self.index[low:high].tolist():
+                    yield points[i]
 
-    return result
 
+def split_levels(n):
+    # For every level of the tree yields low, high and middle of the node each position belongs to
+    positions = np.arange(n)
+    low = np.zeros(n, dtype=np.int64)
+    high = np.full(n, n, dtype=np.int64)
+    while n and np.any(high - low > 1):
+        middle = low + (high - low - 1) // 2
+        yield low, high, middle
+        low, high = (np.where(positions < middle, low, np.where(positions == middle, middle, middle + 1)),
+                     np.where(positions < middle, middle, np.where(positions == middle, middle + 1, high)))
+
+
+def build_kd_order(xs, ys):
+    # Each axis is sorted once. On every level all medians are read off the array sorted by the
+    # split axis and the other array is stably partitioned around them, O(n) per level with no
+    # per-node work in Python.
+    n = len(xs)
+    by_axis = [np.lexsort((ys, xs)), np.lexsort((xs, ys))]
+    positions = np.arange(n)
+    side = np.empty(n, dtype=np.int8)
+
+    for depth, (low, high, middle) in enumerate(split_levels(n)):
+        axis = depth % 2
+        other = 1 - axis
+        side[by_axis[axis]] = np.sign(positions - middle)
 
-def check(node, x_range, y_range, result, k):
-    if k == 0:
-        axis = node.point.x
-        this_range = x_range
+        ids = by_axis[other]
+        is_left = side[ids] < 0
+        is_right = side[ids] > 0
+        left_before = np.cumsum(is_left) - is_left
+        right_before = np.cumsum(is_right) - is_right
+        target = np.where(is_left, low + left_before - left_before[low],
+                          np.where(is_right, middle + 1 + right_before - right_before[low], middle))
+        by_axis[other] = np.empty_like(ids)
+        by_axis[other][target] = ids
+
+    return by_axis[0]
+
+
+def subtree_bounds(values):
+    # Minimum and maximum of the values in the subtree of every node, stored at its median.
+    # Leaves are their own bounds; every level adds the nodes split on it.
+    minimum = values.copy()
+    maximum = values.copy()
+    for low, high, middle in split_levels(len(values)):
+        starts = np.flatnonzero(np.r_[True, low[1:] != low[:-1]])
+        split = high[starts] - starts > 1
+        minimum[middle[starts[split]]] = np.minimum.reduceat(values, starts)[split]
+        maximum[middle[starts[split]]] = np.maximum.reduceat(values, starts)[split]
+    return minimum, maximum
+
+
+def search_points(node, x_range, y_range, result):
+    timer = stats.start()
+    found = len(result)
+    if isinstance(node, Node):
+        result.extend(node.tree.iter_points(x_range, y_range, node))
     else:
-        axis = node.point.y
-        this_range = y_range
-
-    if this_range[0] < axis < this_range[1]:
-        if check_point(node.point, x_range, y_range):
-            result.append(node.point)
-        if node.left:
-            search_points(node.left, x_range, y_range, result)
-        if node.right:
-            search_points(node.right, x_range, y_range, result)
-    if this_range[1] < axis:
-        if node.left:
-            search_points(node.left, x_range, y_range, result)
+        result.extend(node.iter_points(x_range, y_range))
+
+    if stats.enabled:
+        stats.record('search_points', timer, found=len(result) - found)
+    return result
+
+
+class RangeTree:
+    # Static 2D range tree over the points sorted by x, stored level by level in flat arrays.
+    # On level l the points form blocks of 2 ** l consecutive x ranks (the nodes of that level), each
+    # block sorted by y in index[l]. left[l][i] is how many elements of the block before position i
+    # come from its left child: the fractional cascading pointer, so a query does one binary search
+    # by y at the root and O(1) work per node below it, O(log n + k) in total.
+
+    def __init__(self, xs, ys, points=None):
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        n = len(xs)
+        dtype = np.int32 if n < 2 ** 31 else np.int64
+        self._points = points
+        self.size = n
+        self.height = max(n - 1, 0).bit_length()
+
+        # The only sorts by coordinate: by x for the blocks, by y for the order inside them
+        by_x = np.lexsort((ys, xs))
+        self.xs = xs[by_x]
+        y_rank = np.empty(n, dtype=np.int64)
+        y_rank[np.lexsort((xs, ys))] = np.arange(n)
+        # Position of every point in xs and in root_ys, to make Points for the hits alone
+        self.x_rank = np.empty(n, dtype=dtype)
+        self.x_rank[by_x] = np.arange(n)
+        self.y_rank = y_rank.astype(dtype)
+        y_rank = y_rank[by_x]
+
+        # x ranks in the order of the current level; a level is built from the one below by
+        # merging the sorted blocks pairwise, which the stable sort does in runs
+        order = np.arange(n)
+        positions = np.arange(n)
+        self.index = [by_x.astype(dtype)]
+        self.left = [None]
+        for level in range(1, self.height + 1):
+            order = order[np.argsort((order >> level) * n + y_rank[order], kind='stable')]
+            self.index.append(by_x[order].astype(dtype))
+            from_left = ((order >> (level - 1)) & 1) == 0
+            before = np.cumsum(from_left) - from_left
+            block_start = (positions >> level) << level
+            self.left.append((before - before[block_start]).astype(dtype))
+        self.root_ys = ys[self.index[self.height]]
+
+    def query(self, x_range, y_range):
+        # Indices of the points strictly inside the rectangle
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64)
+        timer = stats.start()
+        first = np.searchsorted(self.xs, x_range[0], side='right')
+        last = np.searchsorted(self.xs, x_range[1], side='left')
+        p = int(np.searchsorted(self.root_ys, y_range[0], side='right'))
+        q = int(np.searchsorted(self.root_ys, y_range[1], side='left'))
+
+        found = []
+        stack = [(self.height, 0, p, q)]
+        visited = 0
+        while stack:
+            level, block, p, q = stack.pop()
+            visited += 1
+            start = block << level
+            end = min(start + (1 << level), self.size)
+            if p >= q or end <= first or start >= last:
+                continue
+            if first <= start and end <= last:
+                found.append(self.index[level][start + p:start + q])
+                continue
+
+            half = 1 << (level - 1)
+            left_p = self._from_left(level, start, end, p)
+            left_q = self._from_left(level, start, end, q)
+            stack.append((level - 1, 2 * block, left_p, left_q))
+            if end - start > half:
+                stack.append((level - 1, 2 * block + 1, p - left_p, q - left_q))
+
+        if stats.enabled:
+            stats.record('range_tree.query', timer, visited=visited, blocks=len(found))
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(found)
+
+    def iter_points(self, x_range, y_range):
+        found = self.query(x_range, y_range)
+        if self._points is not None:
+            points = self._points
+            for i in found.tolist():
+                yield points[i]
+        else:
+            yield from map(Point, self.xs[self.x_rank[found]].tolist(), self.root_ys[self.y_rank[found]].tolist())
+
+    def _from_left(self, level, start, end, position):
+        if position == end - start:
+            return min(1 << (level - 1), end - start)
+        return int(self.left[level][start + position])
+
+
+def build_tree(points):
+    # Root of the k-d tree, None for no points
+    return KDTree(*point_columns(points), points).root
+
+
+def build_range_tree(points):
+    return RangeTree(*point_columns(points), points)
+
+
+def search_many(tree, rects, processes=None, chunk_size=4096):
+    # Answers every (x1, x2, y1, y2) row of rects. The result is in CSR form: the indices of the
+    # points inside rects[i] are indices[offsets[i]:offsets[i + 1]]. With processes > 1 a k-d tree
+    # is shared with a pool of workers for this call; pass a SharedSearch as the tree instead to
+    # share it once for many calls.
+    if isinstance(tree, Node):
+        tree = tree.tree
+    rects = np.ascontiguousarray(rects, dtype=np.float64).reshape(-1, 4)
+    chunks = [rects[start:start + chunk_size] for start in range(0, len(rects), chunk_size)]
+
+    if isinstance(tree, SharedSearch):
+        results = tree.pool.map(search_chunk, chunks)
+    elif not processes or processes == 1 or not isinstance(tree, KDTree):
+        results = [search_rects(tree, chunk) for chunk in chunks]
     else:
-        if node.right:
-            search_points(node.right, x_range, y_range, result)
+        with SharedSearch(tree, processes) as shared:
+            return search_many(shared, rects, chunk_size=chunk_size)
+
+    counts = [counts for counts, _ in results]
+    indices = [indices for _, indices in results]
+    offsets = np.zeros(len(rects) + 1, dtype=np.int64)
+    if counts:
+        np.cumsum(np.concatenate(counts), out=offsets[1:])
+    return offsets, np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+
+
+def search_rects(tree, rects):
+    found = [tree.query((x1, x2), (y1, y2)) for x1, x2, y1, y2 in rects.tolist()]
+    counts = np.array([len(indices) for indices in found], dtype=np.int64)
+    return counts, np.concatenate(found).astype(np.int64) if found else np.empty(0, dtype=np.int64)
+
+
+class SharedSearch:
+    # A k-d tree copied once into shared memory and a pool of workers attached to it, for
+    # search_many calls with many batches of rectangles. Only the rectangles and the results
+    # travel between the processes. close() or the end of a with block stops the workers and
+    # frees the memory.
+    def __init__(self, tree, processes=None):
+        if isinstance(tree, Node):
+            tree = tree.tree
+        arrays = {name: getattr(tree, name) for name in KDTree.ARRAYS}
+        self.blocks = {name: share_array(array) for name, array in arrays.items()}
+        specs = {name: (block.name, arrays[name].shape, arrays[name].dtype.str) for name, block in self.blocks.items()}
+        try:
+            self.pool = Pool(processes, initializer=attach_worker, initargs=(specs,))
+        except BaseException:
+            self._free()
+            raise
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+        self._free()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _free(self):
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+
+def share_array(array):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block
+
+
+# Tree of a pool worker, views into the shared memory of the parent process
+worker = {}
+
+
+def attach_worker(specs):
+    arrays = {}
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        worker.setdefault('blocks', []).append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    worker['tree'] = KDTree.from_arrays(arrays)
+
+
+def search_chunk(rects):
+    return search_rects(worker['tree'], rects)
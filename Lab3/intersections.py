@@ -0,0 +1,405 @@
+import heapq
+import math
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from sortedcontainers import SortedList
+
+from geometry import binary, loader, predicates, stats
+from geometry.core import Point, Segment, SegmentArray
+
+
+class EventQueue:
+    # Event points as plain (x, y) tuples in a heap. A point is queued only once however many
+    # segments end or cross there, so a pair of segments never has more than one pending event
+    # and the heap holds at most 2n + k entries.
+    __slots__ = ('heap', 'queued')
+
+    def __init__(self, points=()):
+        self.queued = set(points)
+        self.heap = list(self.queued)
+        heapq.heapify(self.heap)
+
+    def __bool__(self):
+        return bool(self.heap)
+
+    def push(self, point):
+        key = (point.x, point.y)
+        if key not in self.queued:
+            self.queued.add(key)
+            heapq.heappush(self.heap, key)
+
+    def pop(self):
+        key = heapq.heappop(self.heap)
+        self.queued.remove(key)
+        return key
+
+
+# `auto` uses the grid when 90% of the segments are at most this many times longer than the
+# average spacing between segments
+GRID_LENGTH_RATIO = 4
+
+
+def find_intersections(segments, method="auto"):
+    # All (point, segment1, segment2) with exact points, by the sweep or by the grid
+    return list(iter_intersections(segments, method))
+
+
+def iter_intersections(segments, method="auto"):
+    # The same tuples one at a time, each as soon as the method finds it
+    segments, method = resolve_method(segments, method)
+    if method == "sweep":
+        return sweep_intersections(segments)
+    return grid_intersections(segments)
+
+
+def count_intersections(segments, method="auto"):
+    # Number of intersecting pairs. Nothing is kept, and the grid does not even build the points.
+    segments, method = resolve_method(segments, method)
+    if method == "grid":
+        segments, first, second = grid_pairs(segments)
+        return sum(predicates.intersects(segments[i].start, segments[i].end, segments[j].start, segments[j].end)
+                   for i, j in zip(first.tolist(), second.tolist()))
+    return sum(1 for _ in iter_intersections(segments, method))
+
+
+def resolve_method(segments, method):
+    # The segments and the method the entry points run: "auto" picks one by choose_method
+    if method == "auto":
+        # choose_method reads the segments once already
+        segments = reusable(segments)
+        method = choose_method(segments)
+    if method not in ("sweep", "grid"):
+        raise ValueError(f"Unknown method {method!r}, expected 'grid', 'sweep' or 'auto'")
+    return segments, method
+
+
+def reusable(segments):
+    # Segments that can be read more than once: arrays and lists as they are, anything else
+    # (a generator, an iterator) as a list
+    return segments if isinstance(segments, (list, tuple, SegmentArray)) else list(segments)
+
+
+def choose_method(segments):
+    # Short, evenly spread segments share cells with few others, long ones would fill the grid
+    _, coordinates, _ = segment_arrays(segments)
+    if len(coordinates) < 2:
+        return "sweep"
+    low_x, low_y, high_x, high_y = bounding_boxes(coordinates)
+    area = (high_x.max() - low_x.min()) * (high_y.max() - low_y.min())
+    lengths = np.maximum(high_x - low_x, high_y - low_y)
+    return "grid" if np.percentile(lengths, 90) <= GRID_LENGTH_RATIO * math.sqrt(area / len(lengths)) else "sweep"
+
+
+def sweep_intersections(segments):
+    # Bentley-Ottmann: all event points at once are handled together, so the status only ever
+    # compares segments by their y at the sweep line, O((n + k) log n)
+    timer = stats.start()
+    tracing = stats.enabled
+    line = SweepLine()
+    sweep_line = SortedList()
+    starting = {}
+    endpoints = []
+
+    for segment in segments:
+        if segment.start == segment.end:
+            continue
+        starting.setdefault((segment.start.x, segment.start.y), []).append(StatusSegment(line, segment))
+        endpoints.append((segment.start.x, segment.start.y))
+        endpoints.append((segment.end.x, segment.end.y))
+
+    event_queue = EventQueue(endpoints)
+    # Event points, and how many segments start, end and pass through them
+    events = starts = ends = passes = largest_queue = largest_status = found = 0
+    while event_queue:
+        if tracing:
+            largest_queue = max(largest_queue, len(event_queue.heap))
+        key = event_queue.pop()
+        point = Point(*key)
+        beginning = starting.pop(key, [])
+        through = handle_event_point(point, beginning, line, sweep_line, event_queue)
+        if tracing:
+            ending = sum(status.segment.end == point for status in through)
+            events += 1
+            starts += len(beginning)
+            ends += ending
+            passes += len(through) - len(beginning) - ending
+            largest_status = max(largest_status, len(sweep_line))
+        for i, first in enumerate(through):
+            for second in through[i + 1:]:
+                if not first.collinear(second):
+                    found += 1
+                    yield point, first.segment, second.segment
+
+    if tracing:
+        stats.record('sweep_intersections', timer, {'largest_queue': largest_queue, 'largest_status': largest_status},
+                     segments=len(endpoints) // 2, events=events, starts=starts, ends=ends, passes=passes,
+                     intersections=found)
+
+
+def handle_event_point(point, starting, line, sweep_line, event_queue):
+    # Updates the status at the point and returns the segments through it
+    line.x, line.y = point.x, point.y
+    probe = StatusSegment(line, Segment(point, point))
+
+    # Segments through the point are next to each other; they leave the status in the order
+    # they had before it and come back (unless they end here) in the order they have after it
+    low = sweep_line.bisect_left(probe)
+    high = sweep_line.bisect_right(probe)
+    passing = sweep_line[low:high]
+    # One by one: deleting a slice makes SortedList sort the rest again
+    for _ in passing:
+        del sweep_line[low]
+
+    for status in passing:
+        if status.segment.end != point:
+            sweep_line.add(status)
+    for status in starting:
+        sweep_line.add(status)
+
+    low = sweep_line.bisect_left(probe)
+    high = sweep_line.bisect_right(probe)
+    if low == high:
+        check_and_add_intersection(neighbour(sweep_line, low - 1), neighbour(sweep_line, low), point, event_queue)
+    else:
+        check_and_add_intersection(neighbour(sweep_line, low - 1), sweep_line[low], point, event_queue)
+        check_and_add_intersection(sweep_line[high - 1], neighbour(sweep_line, high), point, event_queue)
+    return passing + starting
+
+
+def neighbour(sweep_line, index):
+    return sweep_line[index] if 0 <= index < len(sweep_line) else None
+
+
+class SweepLine:
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+
+
+class StatusSegment:
+    # Segment ordered by its y at the sweep line. Segments meeting there are ordered by slope
+    # after the sweep point; a vertical segment stands for its point nearest to the sweep point
+    # and goes above the others. A zero length segment is a probe equal to everything through it.
+    __slots__ = ('line', 'segment', 'vertical')
+
+    def __init__(self, line, segment):
+        self.line = line
+        self.segment = segment
+        self.vertical = segment.start.x == segment.end.x
+
+    def point_at(self):
+        # Point of a vertical segment on the sweep line
+        start, end = self.segment.start, self.segment.end
+        return Point(self.line.x, min(max(self.line.y, start.y), end.y))
+
+    def compare(self, other):
+        # Sign of y(self) - y(other) at the sweep line
+        if not self.vertical and not other.vertical:
+            return predicates.compare_at_x(self.segment.start, self.segment.end,
+                                           other.segment.start, other.segment.end, self.line.x)
+        if self.vertical and other.vertical:
+            y, other_y = self.point_at().y, other.point_at().y
+            return (y > other_y) - (y < other_y)
+        if self.vertical:
+            return predicates.orientation(other.segment.start, other.segment.end, self.point_at())
+        return -predicates.orientation(self.segment.start, self.segment.end, other.point_at())
+
+    def collinear(self, other):
+        return predicates.orientation(self.segment.start, self.segment.end, other.segment.start) == 0 and \
+            predicates.orientation(self.segment.start, self.segment.end, other.segment.end) == 0
+
+    def __lt__(self, other):
+        side = self.compare(other)
+        if side:
+            return side < 0
+        if self.segment.start == self.segment.end or other.segment.start == other.segment.end:
+            return False
+        if self.vertical or other.vertical:
+            return other.vertical and not self.vertical
+        # Both pass through the same point of the sweep line: the one with the smaller slope
+        # has the other's far end above it
+        far = other.segment.end if other.segment.end.x != self.line.x else other.segment.start
+        turn = predicates.orientation(self.segment.start, self.segment.end, far)
+        return turn > 0 if far is other.segment.end else turn < 0
+
+
+def grid_intersections(segments):
+    # Uniform grid broad phase: only pairs of segments whose bounding boxes share a cell are
+    # tested, with NumPy, and only the pairs the float filter cannot rule out reach the exact test
+    segments, first, second = grid_pairs(segments)
+    for i, j in zip(first.tolist(), second.tolist()):
+        point = find_intersection(segments[i], segments[j])
+        if point:
+            yield point, segments[i], segments[j]
+
+
+def grid_pairs(segments):
+    # The non-degenerate segments and the index pairs left for the exact test
+    timer = stats.start()
+    segments, coordinates, representable = segment_arrays(segments)
+    first, second = grid_candidates(coordinates)
+    candidates = len(first)
+    if representable:
+        first, second = filter_candidates(coordinates, first, second)
+    if stats.enabled:
+        stats.record('grid_pairs', timer, segments=len(segments), candidates=candidates, exact_tests=len(first))
+    return segments, first, second
+
+
+def segment_arrays(segments):
+    # The non-degenerate segments, their (x1, y1, x2, y2) rows and whether floats hold them exactly
+    if isinstance(segments, SegmentArray):
+        segments = segments[(segments.x1 != segments.x2) | (segments.y1 != segments.y2)]
+        columns = segments.x1, segments.y1, segments.x2, segments.y2
+        representable = all(column.dtype.kind == 'f' or np.all(np.abs(column) <= 2 ** 53) for column in columns)
+        return segments, np.column_stack(columns).astype(np.float64).reshape(-1, 4), representable
+    segments = [segment for segment in segments if segment.start != segment.end]
+    values = [(segment.start.x, segment.start.y, segment.end.x, segment.end.y) for segment in segments]
+    coordinates = np.array(values, dtype=np.float64).reshape(-1, 4)
+    representable = all(float(value) == value for row in values for value in row)
+    return segments, coordinates, representable
+
+
+def bounding_boxes(coordinates):
+    x1, y1, x2, y2 = coordinates.T
+    return np.minimum(x1, x2), np.minimum(y1, y2), np.maximum(x1, x2), np.maximum(y1, y2)
+
+
+def grid_candidates(coordinates):
+    # Pairs (i, j), i < j in cell order, of segments whose bounding boxes overlap, each reported
+    # once: in the cell holding the lower left corner of the overlap
+    empty = np.empty(0, dtype=np.int64)
+    if len(coordinates) < 2:
+        return empty, empty
+    low_x, low_y, high_x, high_y = bounding_boxes(coordinates)
+    origin_x, origin_y = low_x.min(), low_y.min()
+    area = (high_x.max() - origin_x) * (high_y.max() - origin_y)
+    lengths = np.maximum(high_x - low_x, high_y - low_y)
+    cell = max(lengths.mean(), math.sqrt(area / len(lengths)))
+
+    def column_of(x):
+        return np.floor((x - origin_x) / cell).astype(np.int64)
+
+    def row_of(y):
+        return np.floor((y - origin_y) / cell).astype(np.int64)
+
+    first_column, first_row = column_of(low_x), row_of(low_y)
+    widths = column_of(high_x) - first_column + 1
+    heights = row_of(high_y) - first_row + 1
+    columns = int((first_column + widths).max())
+
+    # Every segment in every cell of its bounding box, sorted by cell
+    counts = widths * heights
+    owners = np.repeat(np.arange(len(coordinates)), counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    row_widths = np.repeat(widths, counts)
+    cells = (np.repeat(first_row, counts) + within // row_widths) * columns + np.repeat(first_column, counts) + within % row_widths
+    order = np.argsort(cells, kind='stable')
+    cells, owners = cells[order], owners[order]
+
+    # Every entry paired with the entries after it in the same cell
+    group_ends = np.r_[np.flatnonzero(cells[1:] != cells[:-1]) + 1, len(cells)]
+    partners = np.repeat(group_ends, np.diff(np.r_[0, group_ends])) - np.arange(len(cells)) - 1
+    left = np.repeat(np.arange(len(cells)), partners)
+    right = left + 1 + np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners)
+    first, second = owners[left], owners[right]
+
+    corner_x = np.maximum(low_x[first], low_x[second])
+    corner_y = np.maximum(low_y[first], low_y[second])
+    keep = (corner_x <= np.minimum(high_x[first], high_x[second])) & \
+        (corner_y <= np.minimum(high_y[first], high_y[second])) & (row_of(corner_y) * columns + column_of(corner_x) == cells[left])
+    return first[keep], second[keep]
+
+
+def filter_candidates(coordinates, first, second):
+    # Drops the pairs where one segment is certainly on one side of the other
+    x1, y1, x2, y2 = coordinates.T
+    a = (x1[first], y1[first], x2[first], y2[first])
+    b = (x1[second], y1[second], x2[second], y2[second])
+    side1, certain1 = predicates.orientation_signs(*b, a[0], a[1])
+    side2, certain2 = predicates.orientation_signs(*b, a[2], a[3])
+    side3, certain3 = predicates.orientation_signs(*a, b[0], b[1])
+    side4, certain4 = predicates.orientation_signs(*a, b[2], b[3])
+    apart = (certain1 & certain2 & (side1 * side2 > 0)) | (certain3 & certain4 & (side3 * side4 > 0))
+    return first[~apart], second[~apart]
+
+
+def find_intersections_parallel(segments, processes=None, strips=None, method="auto"):
+    # find_intersections on vertical strips in separate processes. Strips hold about the same
+    # number of segments; a segment goes to every strip it reaches, and a strip reports only
+    # the intersections with x in its own half-open range, so boundary crossings come once.
+    segments, coordinates, representable = segment_arrays(segments)
+    processes = processes or os.cpu_count()
+    strips = strips or processes
+    if not representable:
+        coordinates = np.array([(segment.start.x, segment.start.y, segment.end.x, segment.end.y)
+                                for segment in segments], dtype=object).reshape(-1, 4)
+
+    low_x, _, high_x, _ = bounding_boxes(coordinates.astype(np.float64))
+    bounds = np.quantile((low_x + high_x) / 2, np.linspace(0, 1, strips + 1)[1:-1]) if len(segments) else []
+    bounds = np.r_[-np.inf, bounds, np.inf].tolist()
+    tasks = []
+    for low, high in zip(bounds[:-1], bounds[1:]):
+        if low < high:
+            ids = np.flatnonzero((high_x >= low) & (low_x < high))
+            tasks.append((coordinates[ids], ids, low, high, method))
+
+    if processes > 1 and len(tasks) > 1:
+        with Pool(processes) as pool:
+            results = pool.map(strip_intersections, tasks)
+    else:
+        results = map(strip_intersections, tasks)
+    return [(Point(x, y), segments[first], segments[second])
+            for result in results for x, y, first, second in result]
+
+
+def strip_intersections(task):
+    # Pool worker: intersections inside one strip as (x, y, id1, id2) with ids into the full list
+    rows, ids, low, high, method = task
+    segments = [Segment(Point(x1, y1), Point(x2, y2)) for x1, y1, x2, y2 in rows.tolist()]
+    index = {id(segment): i for segment, i in zip(segments, ids.tolist())}
+    return [(point.x, point.y, index[id(first)], index[id(second)])
+            for point, first, second in find_intersections(segments, method) if low <= point.x < high]
+
+
+def check_and_add_intersection(status1, status2, point, event_queue):
+    # Only crossings still ahead of the sweep point become events
+    if not status1 or not status2:
+        return
+    intersection_point = find_intersection(status1.segment, status2.segment)
+    if intersection_point and point < intersection_point:
+        event_queue.push(intersection_point)
+
+
+def find_intersection(segment1, segment2):
+    # Exact predicates, so the point has exact Fraction coordinates
+    point = predicates.intersection(segment1.start, segment1.end, segment2.start, segment2.end)
+    if point is None:
+        return None
+    return Point(*point)
+
+
+def read_segments(file_name):
+    # One "x1 y1 x2 y2" per line, or a binary segments file, as a SegmentArray over the
+    # (memory-mapped) array
+    if binary.is_binary(file_name):
+        _, (data,) = binary.read(file_name, binary.SEGMENTS)
+    else:
+        data = loader.read_array(file_name, 4)
+    return SegmentArray.from_array(data)
+
+
+def plot_segments_and_intersections(axes, segments, intersections):
+    axes.figure.set_size_inches(10, 10)
+
+    for segment in segments:
+        axes.plot([segment.start.x, segment.end.x], [segment.start.y, segment.end.y], 'b')
+
+    for intersection in intersections:
+        point, seg1, seg2 = intersection
+        axes.plot(point.x, point.y, 'ro')
+
+    axes.grid(True)
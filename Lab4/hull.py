@@ -0,0 +1,401 @@
+import numpy as np
+from sortedcontainers import SortedList
+
+from geometry import binary, loader, plotting, predicates, stats
+from geometry.core import Point, PointArray
+
+class ConvexHullNode:
+    # Leaves hold the points. An internal node holds the bridge of its subtree: the edge of the
+    # upper hull of its points that joins the hulls of its two children. Those bridges describe
+    # the hull of every subtree, so nothing else has to be stored (Overmars and van Leeuwen).
+    def __init__(self, point):
+        self.point = point
+        self.left = None
+        self.right = None
+        self.parent = None
+        # Smallest point of the right subtree, the search key of an internal node
+        self.left_most_right = None
+        self.bridge = None
+        self.height = 0
+
+
+class ConvexHullBST:
+    # Upper hull of a set of points in a leaf-oriented AVL tree ordered by (x, y). Insert and
+    # delete recompute the bridges on the path to the root, O(log n) each, so O(log^2 n) in total.
+    def __init__(self):
+        self.root = None
+
+    def build(self, points):
+        # Balanced tree over sorted distinct points, bridges computed bottom-up in O(n log n)
+        timer = stats.start()
+        self.root = self._build(points, 0, len(points)) if points else None
+        if stats.enabled:
+            stats.record('hull.build', timer, {'height': self.root.height if self.root else 0}, points=len(points))
+
+    def _build(self, points, low, high):
+        if high - low == 1:
+            return ConvexHullNode(points[low])
+        middle = (low + high) // 2
+        node = ConvexHullNode(None)
+        node.left = self._build(points, low, middle)
+        node.right = self._build(points, middle, high)
+        node.left.parent = node.right.parent = node
+        self._update_node(node)
+        return node
+
+    def insert(self, point):
+        timer = stats.start()
+        new_node = ConvexHullNode(point)
+        if self.root is None:
+            self.root = new_node
+            return
+
+        leaf = self.root
+        while leaf.point is None:
+            leaf = leaf.right if not point < leaf.left_most_right else leaf.left
+        if leaf.point == point:
+            return
+
+        node = ConvexHullNode(None)
+        node.left, node.right = (new_node, leaf) if point < leaf.point else (leaf, new_node)
+        self._replace(leaf, node)
+        new_node.parent = leaf.parent = node
+        bridges, rotations = self._update_hull(node)
+        if stats.enabled:
+            stats.record('hull.insert', timer, {'height': self.root.height}, bridges=bridges, rotations=rotations)
+
+    def delete(self, point):
+        timer = stats.start()
+        node = self._find(self.root, point)
+        if not node:
+            return
+
+        parent = node.parent
+        if parent is None:
+            self.root = None
+            return
+        sibling = parent.right if parent.left is node else parent.left
+        self._replace(parent, sibling)
+        bridges, rotations = self._update_hull(sibling.parent)
+        if stats.enabled:
+            stats.record('hull.delete', timer, {'height': self.root.height}, bridges=bridges, rotations=rotations)
+
+    def _replace(self, node, other):
+        # Puts `other` where `node` hangs in the tree
+        other.parent = node.parent
+        if node.parent is None:
+            self.root = other
+        elif node.parent.left is node:
+            node.parent.left = other
+        else:
+            node.parent.right = other
+
+    def _find(self, node, point):
+        while node and node.point is None:
+            node = node.right if not point < node.left_most_right else node.left
+        if node and node.point == point:
+            return node
+        return None
+
+    def _find_min(self, node):
+        while node.left:
+            node = node.left
+        return node
+
+    def _update_hull(self, node):
+        # Fixes heights, keys and bridges from node up to the root, rotating where AVL needs it.
+        # Returns how many bridges were computed and how many rotations were made.
+        bridges = rotations = 0
+        while node:
+            self._update_node(node)
+            bridges += 1
+            balance = node.left.height - node.right.height
+            if balance > 1:
+                if node.left.left.height < node.left.right.height:
+                    self._rotate_left(node.left)
+                    rotations += 1
+                node = self._rotate_right(node)
+                rotations += 1
+            elif balance < -1:
+                if node.right.right.height < node.right.left.height:
+                    self._rotate_right(node.right)
+                    rotations += 1
+                node = self._rotate_left(node)
+                rotations += 1
+            node = node.parent
+        # Every rotation computes the bridges of the two nodes it turns
+        return bridges + 2 * rotations, rotations
+
+    def _update_node(self, node):
+        node.height = max(node.left.height, node.right.height) + 1
+        node.left_most_right = self._find_min(node.right).point
+        node.bridge = self._find_bridge(node)
+
+    def _rotate_left(self, node):
+        top = node.right
+        self._replace(node, top)
+        node.right = top.left
+        node.right.parent = node
+        top.left = node
+        node.parent = top
+        self._update_node(node)
+        self._update_node(top)
+        return top
+
+    def _rotate_right(self, node):
+        top = node.left
+        self._replace(node, top)
+        node.left = top.right
+        node.left.parent = node
+        top.right = node
+        node.parent = top
+        self._update_node(node)
+        self._update_node(top)
+        return top
+
+    def _find_bridge(self, node):
+        # Walks down the hulls of both children at once. Every step looks at one hull edge (or
+        # point) on each side and moves below one of them, towards the side the bridge must be on.
+        left, right = node.left, node.right
+        left_low = left_high = right_low = right_high = None
+        while True:
+            left = self._narrow(left, left_low, left_high)
+            right = self._narrow(right, right_low, right_high)
+            if left.point is not None and right.point is not None:
+                return left.point, right.point
+
+            a1, a2 = left.bridge or (left.point, left.point)
+            b1, b2 = right.bridge or (right.point, right.point)
+            if left.point is None and (predicates.orientation(a1, a2, b1) >= 0 or predicates.orientation(a1, a2, b2) >= 0):
+                # A right point on or above the line of edge a: the bridge leaves the left hull before a
+                left, left_high = left.left, a1
+            elif right.point is None and (predicates.orientation(b1, b2, a1) >= 0 or predicates.orientation(b1, b2, a2) >= 0):
+                right, right_low = right.right, b2
+            elif left.point is not None or (right.point is None and not predicates.crosses_before(a1, a2, b1, b2, node.left_most_right)):
+                # Edge b stays on the joint hull, so the bridge reaches the right hull before it.
+                # With two edges this holds when their lines cross at or after the split point, as
+                # all left points are then below the line of b; otherwise edge a stays instead.
+                right, right_high = right.left, b1
+            else:
+                left, left_low = left.right, a2
+
+    def _narrow(self, node, low, high):
+        # Skips the subtrees whose bridge lies outside the part of the hull between low and high
+        while node.point is None:
+            c1, c2 = node.bridge
+            if low is not None and not low < c2:
+                node = node.right
+            elif high is not None and not c1 < high:
+                node = node.left
+            else:
+                break
+        return node
+
+    def get_hull_points(self):
+        return self._collect_points(self.root, None, None) if self.root else []
+
+    def _collect_points(self, node, low, high):
+        # Hull vertices of the subtree from low to high (None for no bound)
+        if node.point is not None:
+            return [node.point]
+        c1, c2 = node.bridge
+        if low is not None and not low < c2:
+            return self._collect_points(node.right, low, high)
+        if high is not None and not c1 < high:
+            return self._collect_points(node.left, low, high)
+        return self._collect_points(node.left, low, c1) + self._collect_points(node.right, c2, high)
+
+
+class InsertionHull:
+    # Upper hull of points that are only ever inserted, as its vertices in a SortedList. A new
+    # point is placed by bisection; the vertices it hides are next to it and are removed one by
+    # one, and as every point is removed at most once an insert is O(log n) amortized.
+    def __init__(self):
+        self.hull = SortedList()
+
+    def insert(self, point):
+        hull = self.hull
+        i = hull.bisect_left(point)
+        if i < len(hull) and hull[i] == point:
+            return
+        if 0 < i < len(hull) and predicates.orientation(hull[i - 1], hull[i], point) <= 0:
+            # On or below the hull edge above it
+            return
+
+        hull.add(point)
+        while i + 2 < len(hull) and predicates.orientation(point, hull[i + 1], hull[i + 2]) >= 0:
+            del hull[i + 1]
+        while i >= 2 and predicates.orientation(hull[i - 2], hull[i - 1], point) >= 0:
+            del hull[i - 1]
+            i -= 1
+
+    def get_hull_points(self):
+        return list(self.hull)
+
+
+class DynamicConvexHull:
+    def __init__(self, insert_only=False, render=False):
+        # insert_only trades remove_point for O(log n) amortized inserts. render: True to show
+        # the hull after every change, or an observer from geometry.plotting
+        self.insert_only = insert_only
+        self.observer = plotting.observer(render)
+        self._points = SortedList()
+        # Sorted (n, 2) coordinates from from_points not yet in _points
+        self._bulk = None
+        hull_type = InsertionHull if insert_only else ConvexHullBST
+        self.upper_hull = hull_type()
+        # The lower hull is kept as the upper hull of the points turned by 180 degrees
+        self.lower_hull = hull_type()
+
+    @classmethod
+    def from_points(cls, points, insert_only=False, render=False):
+        # Builds the structure for a PointArray or an (n, 2) array at once instead of one
+        # add_point per point. Insertion-only hulls never need the interior points again, so they
+        # get only the vertices found in NumPy; the trees of a full hull keep every point for
+        # later removals.
+        if not isinstance(points, PointArray):
+            points = PointArray.from_array(np.asarray(points, dtype=np.float64).reshape(-1, 2))
+        order = np.lexsort((points.ys, points.xs))
+        coordinates = np.column_stack((points.xs[order], points.ys[order])).astype(np.float64)
+        hull = cls(insert_only, render)
+        hull._bulk = coordinates
+
+        repeated = np.all(coordinates[1:] == coordinates[:-1], axis=1)
+        distinct = coordinates[np.r_[True, ~repeated]] if len(coordinates) else coordinates
+        if insert_only:
+            upper, lower = hull_vertices(distinct)
+            hull.upper_hull.hull.update(Point(x, y) for x, y in upper.tolist())
+            hull.lower_hull.hull.update(Point(x, y) for x, y in lower.tolist())
+        else:
+            hull.upper_hull.build([Point(x, y) for x, y in distinct.tolist()])
+            hull.lower_hull.build([Point(x, y) for x, y in (-distinct[::-1]).tolist()])
+        return hull
+
+    @property
+    def points(self):
+        # Every point, made into Points only when asked for: after from_points an insertion-only
+        # hull never needs them unless it renders
+        if self._bulk is not None:
+            self._points.update(Point(x, y) for x, y in self._bulk.tolist())
+            self._bulk = None
+        return self._points
+
+    def add_point(self, point):
+        self._points.add(point)
+        self.upper_hull.insert(point)
+        self.lower_hull.insert(turned(point))
+        self.visualize("Add", point)
+
+    def remove_point(self, point):
+        if self.insert_only:
+            raise ValueError("remove_point needs a DynamicConvexHull created without insert_only")
+        self.points.remove(point)
+        # The trees keep one copy of repeated points
+        if point not in self.points:
+            self.upper_hull.delete(point)
+            self.lower_hull.delete(turned(point))
+        self.visualize("Remove", point)
+
+    def get_upper_hull(self):
+        return self.upper_hull.get_hull_points()
+
+    def get_lower_hull(self):
+        return [turned(point) for point in reversed(self.lower_hull.get_hull_points())]
+
+    def orientation(self, p, q, r):
+        # 1 for a clockwise turn, 2 for a counter-clockwise one
+        turn = predicates.orientation(p, q, r)
+        if turn == 0:
+            return 0
+        return 1 if turn < 0 else 2
+
+    def visualize(self, action, point):
+        if self.observer:
+            self.observer(draw_hull, list(self.points), self.get_upper_hull(), self.get_lower_hull(),
+                          f'{action} Point ({point.x}, {point.y})')
+
+
+def draw_hull(axes, points, upper_hull_points, lower_hull_points, title):
+    x_vals = [p.x for p in points]
+    y_vals = [p.y for p in points]
+
+    axes.scatter(x_vals, y_vals, color='blue')
+    axes.set_title(title)
+    axes.set_xlabel('X')
+    axes.set_ylabel('Y')
+
+    if len(upper_hull_points) > 1:
+        upper_hull_x = [p.x for p in upper_hull_points]
+        upper_hull_y = [p.y for p in upper_hull_points]
+        axes.plot(upper_hull_x, upper_hull_y, color='red')
+
+    if len(lower_hull_points) > 1:
+        lower_hull_x = [p.x for p in lower_hull_points]
+        lower_hull_y = [p.y for p in lower_hull_points]
+        axes.plot(lower_hull_x, lower_hull_y, color='green')
+
+def turned(point):
+    return Point(-point.x, -point.y)
+
+
+def hull_vertices(coordinates):
+    # Upper hull, and lower hull turned by 180 degrees, of distinct (x, y)-sorted coordinates
+    candidates = coordinates[akl_toussaint(coordinates[:, 0], coordinates[:, 1])]
+    upper = candidates[upper_chain(candidates[:, 0], candidates[:, 1])]
+    candidates = -candidates[::-1]
+    lower = candidates[upper_chain(candidates[:, 0], candidates[:, 1])]
+    return upper, lower
+
+
+def akl_toussaint(xs, ys):
+    # Mask of the points not strictly inside the quadrilateral of the leftmost, lowest, rightmost
+    # and highest points; on random inputs that leaves a small fraction of them
+    if len(xs) == 0:
+        return np.zeros(0, dtype=bool)
+    corners = [np.argmin(xs), np.argmin(ys), np.argmax(xs), np.argmax(ys)]
+    inside = np.ones(len(xs), dtype=bool)
+    for a, b in zip(corners, corners[1:] + corners[:1]):
+        signs, certain = predicates.orientation_signs(xs[a], ys[a], xs[b], ys[b], xs, ys)
+        # Points too close to an edge for the float test are kept
+        inside &= certain & (signs > 0)
+    return ~inside
+
+
+def upper_chain(xs, ys):
+    # Monotone chain on (x, y)-sorted distinct points, returning the indices of the upper hull.
+    # Every vertex that is not a clockwise turn between its neighbours is on or below their edge, so
+    # all of them are dropped at once, until none is left. When a round drops only a few, the
+    # rest is finished one point at a time.
+    chain = np.arange(len(xs))
+    while len(chain) > 2:
+        a, b, c = chain[:-2], chain[1:-1], chain[2:]
+        signs, certain = predicates.orientation_signs(xs[a], ys[a], xs[b], ys[b], xs[c], ys[c])
+        for i in np.flatnonzero(~certain):
+            signs[i] = predicates.orientation(*(Point(float(xs[j]), float(ys[j])) for j in (a[i], b[i], c[i])))
+        dropped = signs >= 0
+        count = np.count_nonzero(dropped)
+        if count == 0:
+            break
+        if count * 100 < len(chain):
+            return sequential_upper_chain(xs, ys, chain)
+        chain = np.concatenate(([chain[0]], b[~dropped], [chain[-1]]))
+    return chain
+
+
+def sequential_upper_chain(xs, ys, chain):
+    points = [Point(x, y) for x, y in zip(xs[chain].tolist(), ys[chain].tolist())]
+    hull = []
+    for i, point in enumerate(points):
+        while len(hull) >= 2 and predicates.orientation(points[hull[-2]], points[hull[-1]], point) >= 0:
+            hull.pop()
+        hull.append(i)
+    return chain[hull]
+
+
+def read_points(file_name):
+    # One "x y" per line, or a binary points file, as a PointArray over the (memory-mapped) array
+    if binary.is_binary(file_name):
+        _, (data,) = binary.read(file_name, binary.POINTS)
+    else:
+        data = loader.read_array(file_name, 2)
+    return PointArray.from_array(data)
@@ -0,0 +1,128 @@
+import math
+
+import numpy as np
+
+# Seeded synthetic workloads. Every generator takes a numpy Generator and a size and returns
+# plain arrays, so the same seed gives the same input whatever the algorithm does with it.
+
+
+def monotone_subdivision(rng, count):
+    # Lab1: a jittered rows x columns grid of about `count` vertices. Every cell gets one of its
+    # diagonals or, one time in four, none, so the faces are triangles and convex quadrilaterals
+    # and the subdivision is monotone. Returns xs, ys and the edges as starts, ends.
+    side = max(2, math.isqrt(count))
+    rows, columns = np.divmod(np.arange(side * side), side)
+    # Jitter below a quarter of a cell keeps the grid planar and its columns going upwards. The
+    # bottom and top rows stay level, so each of their vertices has an edge to the right
+    # neighbour, which comes after it in the (y, x) order; with jitter there a vertex above
+    # both neighbours in the top row would have no upward edge.
+    xs = columns + rng.uniform(-0.2, 0.2, side * side)
+    ys = rows + np.where((rows == 0) | (rows == side - 1), 0, rng.uniform(-0.2, 0.2, side * side))
+
+    ids = np.arange(side * side).reshape(side, side)
+    edges = [np.column_stack((ids[:, :-1].ravel(), ids[:, 1:].ravel())),
+             np.column_stack((ids[:-1, :].ravel(), ids[1:, :].ravel()))]
+    cells = (side - 1) ** 2
+    diagonal = rng.integers(0, 4, cells)
+    rising = np.column_stack((ids[:-1, :-1].ravel(), ids[1:, 1:].ravel()))
+    falling = np.column_stack((ids[:-1, 1:].ravel(), ids[1:, :-1].ravel()))
+    edges.append(rising[diagonal < 2])
+    edges.append(falling[diagonal == 2])
+    edges = np.concatenate(edges)
+    return xs, ys, edges[:, 0], edges[:, 1]
+
+
+def subdivision_queries(rng, xs, ys, count):
+    return rng.uniform(xs.min(), xs.max(), count), rng.uniform(ys.min(), ys.max(), count)
+
+
+def uniform_points(rng, count):
+    # Lab2: points in the unit square as (n, 2)
+    return rng.random((count, 2))
+
+
+def clustered_points(rng, count, clusters=None, spread=0.01):
+    # Lab2: Gaussian blobs around random centres, about a thousand points each
+    clusters = clusters or max(1, count // 1000)
+    centres = rng.random((clusters, 2))
+    points = centres[rng.integers(0, clusters, count)] + rng.normal(0, spread, (count, 2))
+    return np.clip(points, 0, 1)
+
+
+def query_rects(rng, points, count, hits=10):
+    # Lab2: (x1, x2, y1, y2) squares centred on random points, with about `hits` points inside
+    # on uniform data; on clustered data they land in the clusters
+    side = math.sqrt(hits / max(len(points), 1))
+    centres = points[rng.integers(0, len(points), count)]
+    return np.column_stack((centres[:, 0] - side / 2, centres[:, 0] + side / 2,
+                            centres[:, 1] - side / 2, centres[:, 1] + side / 2))
+
+
+def random_segments(rng, count, crossings=1.0):
+    # Lab3: (x1, y1, x2, y2) rows of segments in random directions in the unit square. n random
+    # segments of length l cross about n^2 l^2 / pi times, so l is chosen for about `crossings`
+    # intersections per segment.
+    length = min(math.sqrt(math.pi * crossings / (2 * count)), 0.5)
+    starts = rng.random((count, 2)) * (1 - length)
+    angles = rng.random(count) * 2 * np.pi
+    ends = starts + length * np.column_stack((np.abs(np.cos(angles)), np.sin(angles)))
+    return np.column_stack((starts, ends))
+
+
+def grid_segments(rng, count):
+    # Lab3: unit edges of an integer lattice, shuffled. Everything is degenerate: endpoints
+    # are shared by up to four segments and the segments only touch.
+    side = max(2, math.isqrt(count // 2))
+    rows, columns = np.divmod(np.arange(side * side), side)
+    horizontal = np.column_stack((columns, rows, columns + 1, rows))
+    vertical = np.column_stack((columns, rows, columns, rows + 1))
+    segments = np.concatenate((horizontal, vertical)).astype(np.float64)
+    return segments[rng.permutation(len(segments))[:count]]
+
+
+def near_parallel_segments(rng, count, bundle=4):
+    # Lab3: long segments across the unit square with slopes within 1e-12 of 0.5, in bundles of
+    # `bundle` through a shared pivot at x = 0.5 with slopes within 1e-15 of each other. The
+    # segments of a bundle cross at the pivot and are too close along their whole length for
+    # the float filters, so comparing them takes the exact path; the bundles do not cross.
+    bundles = -(-count // bundle)
+    pivots = np.repeat(np.sort(rng.random(bundles)), bundle)[:count]
+    slopes = np.repeat(0.5 + rng.uniform(-1e-12, 1e-12, bundles), bundle)[:count]
+    slopes += rng.uniform(-1e-15, 1e-15, count)
+    return np.column_stack((np.zeros(count), pivots - slopes / 2, np.ones(count), pivots + slopes / 2))
+
+
+def crossing_segments(rng, count, crossings=16):
+    # Lab3: random segments long enough for `crossings` intersections per segment
+    return random_segments(rng, count, crossings)
+
+
+def hull_stream(rng, count, workload, delete_ratio=0.3):
+    # Lab4: `count` points to build the hull from and `count` updates after it. Returns the
+    # initial (n, 2) points, a bool array telling inserts from deletes and the (n, 2) points
+    # of the updates; a delete removes a random point present at that moment.
+    def points(size):
+        if workload == 'circle':
+            # Every point is a hull vertex
+            angles = rng.random(size) * 2 * np.pi
+            return np.column_stack((np.cos(angles), np.sin(angles)))
+        return rng.random((size, 2))
+
+    initial = points(count)
+    inserts = rng.random(count) >= delete_ratio
+    new = points(int(inserts.sum()))
+    updates = np.empty((count, 2))
+    updates[inserts] = new
+
+    present = list(range(count))
+    pool = np.concatenate((initial, new))
+    inserted = count
+    for i, insert in enumerate(inserts.tolist()):
+        if insert:
+            present.append(inserted)
+            inserted += 1
+        else:
+            j = int(rng.integers(0, len(present)))
+            present[j], present[-1] = present[-1], present[j]
+            updates[i] = pool[present.pop()]
+    return initial, inserts, updates
@@ -0,0 +1,42 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from geometry.core import SegmentArray
+from Lab3.intersections import find_intersections, find_intersections_parallel
+
+from . import generators
+
+# Run from the repository root as python -m benchmarks.intersections
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Scaling of the Lab3 segment intersection methods')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--crossings', type=float, default=2.5,
+                        help='intersections a segment takes part in, the same for every size')
+    parser.add_argument('--method', choices=('sweep', 'grid', 'auto'), default='sweep')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='run find_intersections_parallel with this many processes')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(args)
+
+    rng = np.random.default_rng(args.seed)
+    for count in args.sizes:
+        segments = SegmentArray.from_array(generators.random_segments(rng, count, args.crossings))
+        start = time.perf_counter()
+        if args.processes:
+            intersections = len(find_intersections_parallel(segments, args.processes, method=args.method))
+        else:
+            intersections = len(find_intersections(segments, args.method))
+        elapsed = time.perf_counter() - start
+        # Constant in the last column means O((n + k) log n)
+        per_step = elapsed / ((count + intersections) * math.log2(count)) * 1e6
+        print(f"{count:9d} segments  {intersections:9d} intersections  {elapsed:9.2f} s  "
+              f"{per_step:6.2f} us per (n + k) log n")
+
+
+if __name__ == '__main__':
+    main()
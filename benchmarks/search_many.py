@@ -0,0 +1,49 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from Lab2 import range_tree
+
+from . import generators
+
+# Run from the repository root as python -m benchmarks.search_many
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Throughput of range_tree.search_many by number of processes')
+    parser.add_argument('--points', type=int, default=1_000_000)
+    parser.add_argument('--rects', type=int, default=100_000)
+    parser.add_argument('--hits', type=int, default=100, help='points inside a query square on average')
+    parser.add_argument('--processes', type=int, nargs='+',
+                        default=sorted({1, 2, 4, 8, 16, 32, os.cpu_count()} & set(range(1, os.cpu_count() + 1))))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(args)
+
+    rng = np.random.default_rng(args.seed)
+    points = generators.uniform_points(rng, args.points)
+    start = time.perf_counter()
+    tree = range_tree.KDTree(points[:, 0], points[:, 1])
+    print(f"build: {args.points} points in {time.perf_counter() - start:.2f} s")
+    rects = generators.query_rects(rng, points, args.rects, args.hits)
+
+    baseline = None
+    for processes in args.processes:
+        # The tree is shared with the workers before the clock starts, as it is once for many batches
+        shared = range_tree.SharedSearch(tree, processes) if processes > 1 else tree
+        try:
+            start = time.perf_counter()
+            offsets, _ = range_tree.search_many(shared, rects)
+            elapsed = time.perf_counter() - start
+        finally:
+            if shared is not tree:
+                shared.close()
+        throughput = len(rects) / elapsed
+        baseline = baseline or throughput
+        print(f"processes {processes:3d}: {throughput:12.0f} queries/s  speedup {throughput / baseline:5.2f}  "
+              f"({offsets[-1]} points reported)")
+
+
+if __name__ == '__main__':
+    main()
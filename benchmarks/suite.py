@@ -0,0 +1,206 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from geometry.core import Point, SegmentArray
+from Lab1 import chain_method
+from Lab1.graph import Graph
+from Lab2 import range_tree
+from Lab3 import intersections
+from Lab4.hull import DynamicConvexHull
+
+from . import generators
+
+# Run from the repository root as python -m benchmarks.suite
+
+# Metrics compared against a baseline, and whether a larger value is better
+METRICS = {'build_s': False, 'p50_us': False, 'p90_us': False, 'p99_us': False, 'throughput': True,
+           'peak_mb': False}
+
+
+def timed(function, *args):
+    start = time.perf_counter_ns()
+    result = function(*args)
+    return result, (time.perf_counter_ns() - start) / 1e9
+
+
+def latencies(calls):
+    # Nanoseconds taken by every call of an iterable of zero-argument functions
+    times = []
+    for call in calls:
+        start = time.perf_counter_ns()
+        call()
+        times.append(time.perf_counter_ns() - start)
+    return np.array(times, dtype=np.int64)
+
+
+# Every case gets an input made by the generators and returns the build time in seconds (None
+# when there is nothing to build), the latencies of single operations in ns and the
+# throughput in operations per second, plus anything worth reporting.
+
+def chain_subdivision(rng, size, queries):
+    xs, ys, starts, ends = generators.monotone_subdivision(rng, size)
+    qx, qy = generators.subdivision_queries(rng, xs, ys, queries)
+
+    def run():
+        locator, build = timed(lambda: chain_method.ChainLocator(Graph(xs, ys, starts, ends)))
+        points = [Point(x, y) for x, y in zip(qx.tolist(), qy.tolist())]
+        single = latencies(lambda point=point: locator.locate(point) for point in points)
+        _, elapsed = timed(locator.locate_many, qx, qy)
+        return build, single, queries / elapsed, {'vertices': len(xs), 'chains': len(locator.chains)}
+    return run
+
+
+def points_case(generate):
+    def case(rng, size, queries):
+        points = generate(rng, size)
+        rects = generators.query_rects(rng, points, queries)
+
+        def run():
+            tree, build = timed(range_tree.KDTree, points[:, 0], points[:, 1])
+            single = latencies(lambda rect=rect: tree.query(rect[:2], rect[2:]) for rect in rects.tolist())
+            (offsets, _), elapsed = timed(range_tree.search_many, tree, rects)
+            return build, single, queries / elapsed, {'reported': int(offsets[-1])}
+        return run
+    return case
+
+
+def segments_case(generate):
+    def case(rng, size, queries):
+        segments = SegmentArray.from_array(generate(rng, size))
+
+        def run():
+            # Latency is the time to the next intersection, throughput counts segments and
+            # intersections per second
+            method = intersections.choose_method(segments)
+            times = []
+            start = first = time.perf_counter_ns()
+            for _ in intersections.iter_intersections(segments, method):
+                now = time.perf_counter_ns()
+                times.append(now - start)
+                start = now
+            elapsed = (time.perf_counter_ns() - first) / 1e9
+            return None, np.array(times, dtype=np.int64), (size + len(times)) / elapsed, \
+                {'method': method, 'intersections': len(times)}
+        return run
+    return case
+
+
+def hull_case(workload, insert_only=False):
+    def case(rng, size, queries):
+        initial, inserts, updates = generators.hull_stream(rng, size, workload, 0 if insert_only else 0.3)
+
+        def run():
+            hull, build = timed(DynamicConvexHull.from_points, initial, insert_only)
+            stream = [(hull.add_point if insert else hull.remove_point, Point(x, y))
+                      for insert, (x, y) in zip(inserts.tolist(), updates.tolist())]
+            single = latencies(lambda update=update, point=point: update(point) for update, point in stream)
+            return build, single, len(single) / (single.sum() / 1e9), {'hull': len(hull.get_upper_hull()) +
+                                                                        len(hull.get_lower_hull()) - 2}
+        return run
+    return case
+
+
+CASES = {
+    'lab1': {'subdivision': chain_subdivision},
+    'lab2': {'uniform': points_case(generators.uniform_points),
+             'clustered': points_case(generators.clustered_points)},
+    'lab3': {'random': segments_case(generators.random_segments),
+             'grid': segments_case(generators.grid_segments),
+             'near-parallel': segments_case(generators.near_parallel_segments),
+             'crossings': segments_case(generators.crossing_segments)},
+    'lab4': {'random': hull_case('random'),
+             'circle': hull_case('circle'),
+             'insert-only': hull_case('random', insert_only=True)},
+}
+
+
+def measure(run, memory):
+    build, single, throughput, extra = run()
+    result = {'build_s': build, 'throughput': throughput, 'operations': len(single), **extra}
+    if len(single):
+        for percentile in (50, 90, 99):
+            result[f'p{percentile}_us'] = float(np.percentile(single, percentile)) / 1e3
+        result['max_us'] = float(single.max()) / 1e3
+    if memory:
+        # A second run, as tracing allocations slows the first one down several times
+        tracemalloc.start()
+        run()
+        result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return result
+
+
+def compare(results, baseline, tolerance):
+    # Lines describing every metric that got worse than the baseline by more than tolerance
+    previous = {(entry['lab'], entry['workload'], entry['size']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        old = previous.get((entry['lab'], entry['workload'], entry['size']))
+        if old is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if entry.get(metric) is None or not old.get(metric):
+                continue
+            change = entry[metric] / old[metric] - 1
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{entry['lab']} {entry['workload']} n={entry['size']}: {metric} "
+                                   f"{old[metric]:.4g} -> {entry[metric]:.4g} ({change:+.0%})")
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmarks of all labs on seeded synthetic workloads')
+    parser.add_argument('--labs', nargs='+', choices=sorted(CASES), default=sorted(CASES))
+    parser.add_argument('--workloads', nargs='+', help='only these workloads, e.g. uniform circle')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help='input sizes, up to 10^7')
+    parser.add_argument('--queries', type=int, default=10_000, help='queries per Lab1 and Lab2 run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='skip the second, traced run that measures peak memory')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='JSON file of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='relative change of a metric reported as a regression')
+    args = parser.parse_args(args)
+
+    results = []
+    for lab in args.labs:
+        for workload, case in CASES[lab].items():
+            if args.workloads and workload not in args.workloads:
+                continue
+            for size in args.sizes:
+                # The same seed for every case, so a case gets the same input in every run
+                run = case(np.random.default_rng(args.seed), size, args.queries)
+                entry = {'lab': lab, 'workload': workload, 'size': size, **measure(run, args.memory)}
+                results.append(entry)
+                build = 'build -' if entry['build_s'] is None else f"build {entry['build_s']:8.3f} s"
+                latency = f"p50 {entry['p50_us']:9.1f} us  p99 {entry['p99_us']:9.1f} us" \
+                    if 'p50_us' in entry else 'no operations'
+                memory = f"  peak {entry['peak_mb']:8.1f} MB" if 'peak_mb' in entry else ''
+                print(f"{lab} {workload:13s} n={size:<9d} {build}  {latency}  "
+                      f"{entry['throughput']:12.0f} ops/s{memory}", flush=True)
+
+    report = {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+              'seed': args.seed, 'results': results}
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for line in regressions:
+            print('regression:', line)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
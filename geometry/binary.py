@@ -0,0 +1,71 @@
+import numpy as np
+
+# Binary geometry file: a 32 byte header followed by little-endian arrays.
+#   POINTS    rows x 2 float64 (x, y)
+#   GRAPH     rows x 2 float64 vertices, then count x 2 int64 edges (vertex indices)
+#   SEGMENTS  rows x 4 float64 (x1, y1, x2, y2)
+#   RECTS     rows x 4 float64 (x1, x2, y1, y2), the layout of region.txt
+MAGIC = b'CGEO'
+VERSION = 1
+
+POINTS = 1
+GRAPH = 2
+SEGMENTS = 3
+RECTS = 4
+
+HEADER = np.dtype([('magic', 'S4'), ('version', '<u2'), ('kind', '<u2'),
+                   ('rows', '<u8'), ('count', '<u8'), ('reserved', '<u8')])
+COORDINATES = np.dtype('<f8')
+INDICES = np.dtype('<i8')
+COLUMNS = {POINTS: 2, GRAPH: 2, SEGMENTS: 4, RECTS: 4}
+
+
+def is_binary(file_name: str) -> bool:
+    with open(file_name, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def write(file_name: str, kind: int, coordinates, edges=None):
+    coordinates = np.ascontiguousarray(coordinates, dtype=COORDINATES).reshape(-1, COLUMNS[kind])
+    if kind == GRAPH:
+        edges = np.ascontiguousarray(edges, dtype=INDICES).reshape(-1, 2)
+    header = np.zeros(1, dtype=HEADER)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['kind'] = kind
+    header['rows'] = len(coordinates)
+    header['count'] = len(edges) if kind == GRAPH else 0
+
+    with open(file_name, 'wb') as file:
+        file.write(header.tobytes())
+        file.write(coordinates.tobytes())
+        if kind == GRAPH:
+            file.write(edges.tobytes())
+
+
+def read(file_name: str, kind: int = None):
+    # Returns the kind and its read-only arrays, memory-mapped so that nothing is copied or parsed
+    # and processes opening the same file share it through the page cache
+    header = np.fromfile(file_name, dtype=HEADER, count=1)
+    if len(header) == 0 or header['magic'][0] != MAGIC:
+        raise ValueError(f"{file_name} is not a binary geometry file")
+    if header['version'][0] != VERSION:
+        raise ValueError(f"{file_name} has unsupported version {header['version'][0]}")
+    file_kind = int(header['kind'][0])
+    if kind is not None and file_kind != kind:
+        raise ValueError(f"{file_name} holds kind {file_kind}, expected {kind}")
+
+    rows = int(header['rows'][0])
+    coordinates = _map(file_name, COORDINATES, HEADER.itemsize, (rows, COLUMNS[file_kind]))
+    if file_kind != GRAPH:
+        return file_kind, (coordinates,)
+    offset = HEADER.itemsize + rows * COLUMNS[GRAPH] * COORDINATES.itemsize
+    edges = _map(file_name, INDICES, offset, (int(header['count'][0]), 2))
+    return file_kind, (coordinates, edges)
+
+
+def _map(file_name, dtype, offset, shape):
+    # np.memmap cannot map zero bytes
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    return np.memmap(file_name, dtype=dtype, mode='r', offset=offset, shape=shape)
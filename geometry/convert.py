@@ -0,0 +1,47 @@
+import argparse
+
+import numpy as np
+
+from geometry import binary, loader
+
+
+def convert_points(points_file: str, output: str):
+    binary.write(output, binary.POINTS, loader.read_array(points_file, 2))
+
+
+def convert_graph(vertices_file: str, edges_file: str, output: str):
+    binary.write(output, binary.GRAPH, loader.read_array(vertices_file, 2),
+                 loader.read_array(edges_file, 2, np.int64))
+
+
+def convert_segments(segments_file: str, output: str):
+    binary.write(output, binary.SEGMENTS, loader.read_array(segments_file, 4))
+
+
+def convert_region(region_file: str, output: str):
+    # region.txt holds "x1 x2" and "y1 y2" on two lines, several regions follow each other
+    binary.write(output, binary.RECTS, loader.read_array(region_file, 2).reshape(-1, 4))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Convert text geometry files to the binary format')
+    commands = parser.add_subparsers(dest='kind', required=True)
+    for kind, inputs in (('points', ['points']), ('graph', ['vertices', 'edges']),
+                         ('segments', ['segments']), ('region', ['region'])):
+        command = commands.add_parser(kind)
+        for name in inputs + ['output']:
+            command.add_argument(name)
+    args = parser.parse_args(args)
+
+    if args.kind == 'points':
+        convert_points(args.points, args.output)
+    elif args.kind == 'graph':
+        convert_graph(args.vertices, args.edges, args.output)
+    elif args.kind == 'segments':
+        convert_segments(args.segments, args.output)
+    else:
+        convert_region(args.region, args.output)
+
+
+if __name__ == '__main__':
+    main()
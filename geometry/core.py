@@ -0,0 +1,145 @@
+import numpy as np
+
+# The point and segment types of all labs. Points are ordered by (x, y), and equal points hash
+# equally whatever their number types, as 1 == 1.0 == Fraction(1). Segments keep their endpoints
+# in that order. PointArray and SegmentArray hold many of them as NumPy columns; they are
+# accepted where a list of points or segments is, and build the objects only when indexed.
+
+
+class Point:
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def __eq__(self, other):
+        if not isinstance(other, Point):
+            return NotImplemented
+        return self.x == other.x and self.y == other.y
+
+    def __lt__(self, other):
+        if self.x != other.x:
+            return self.x < other.x
+        return self.y < other.y
+
+    def __le__(self, other):
+        return not other < self
+
+    def __gt__(self, other):
+        return other < self
+
+    def __ge__(self, other):
+        return not self < other
+
+    def __hash__(self):
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return f"({self.x}, {self.y})"
+
+
+class Segment:
+    __slots__ = ('start', 'end')
+
+    def __init__(self, start, end):
+        if end < start:
+            start, end = end, start
+        self.start = start
+        self.end = end
+
+    def __eq__(self, other):
+        if not isinstance(other, Segment):
+            return NotImplemented
+        return self.start == other.start and self.end == other.end
+
+    def __lt__(self, other):
+        if self.start != other.start:
+            return self.start < other.start
+        return self.end < other.end
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __repr__(self):
+        return f"Segment({self.start}, {self.end})"
+
+
+class PointArray:
+    # Points as two arrays of coordinates. An int index gives a Point, anything else NumPy can
+    # index with (a slice, a mask, indices) gives another PointArray.
+    __slots__ = ('xs', 'ys')
+
+    def __init__(self, xs, ys):
+        self.xs = np.asarray(xs)
+        self.ys = np.asarray(ys)
+
+    @classmethod
+    def from_points(cls, points):
+        return cls([point.x for point in points], [point.y for point in points])
+
+    @classmethod
+    def from_array(cls, array):
+        # The columns of an (n, 2) array, for example a memory-mapped points file, as views
+        return cls(array[:, 0], array[:, 1])
+
+    def __len__(self):
+        return len(self.xs)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return Point(self.xs[index].item(), self.ys[index].item())
+        return PointArray(self.xs[index], self.ys[index])
+
+    def __iter__(self):
+        return map(Point, self.xs.tolist(), self.ys.tolist())
+
+    def __repr__(self):
+        return f"PointArray({len(self)} points)"
+
+
+class SegmentArray:
+    # Segments as four arrays of endpoint coordinates, each segment with its endpoints in (x, y)
+    # order like Segment. Indexed like PointArray.
+    __slots__ = ('x1', 'y1', 'x2', 'y2')
+
+    def __init__(self, x1, y1, x2, y2):
+        x1, y1, x2, y2 = np.asarray(x1), np.asarray(y1), np.asarray(x2), np.asarray(y2)
+        swap = (x2 < x1) | ((x2 == x1) & (y2 < y1))
+        if swap.any():
+            x1, x2 = np.where(swap, x2, x1), np.where(swap, x1, x2)
+            y1, y2 = np.where(swap, y2, y1), np.where(swap, y1, y2)
+        self.x1, self.y1, self.x2, self.y2 = x1, y1, x2, y2
+
+    @classmethod
+    def from_segments(cls, segments):
+        return cls([segment.start.x for segment in segments], [segment.start.y for segment in segments],
+                   [segment.end.x for segment in segments], [segment.end.y for segment in segments])
+
+    @classmethod
+    def from_array(cls, array):
+        # The columns of an (n, 4) array of x1, y1, x2, y2 rows
+        return cls(array[:, 0], array[:, 1], array[:, 2], array[:, 3])
+
+    def __len__(self):
+        return len(self.x1)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return Segment(Point(self.x1[index].item(), self.y1[index].item()),
+                           Point(self.x2[index].item(), self.y2[index].item()))
+        return SegmentArray(self.x1[index], self.y1[index], self.x2[index], self.y2[index])
+
+    def __iter__(self):
+        columns = self.x1.tolist(), self.y1.tolist(), self.x2.tolist(), self.y2.tolist()
+        return (Segment(Point(x1, y1), Point(x2, y2)) for x1, y1, x2, y2 in zip(*columns))
+
+    def __repr__(self):
+        return f"SegmentArray({len(self)} segments)"
+
+
+def point_columns(points):
+    # x and y arrays of a PointArray as they are, or of any other sequence of points
+    if isinstance(points, PointArray):
+        return points.xs, points.ys
+    return np.array([point.x for point in points]), np.array([point.y for point in points])
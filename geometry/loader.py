@@ -0,0 +1,104 @@
+import numpy as np
+
+# Bytes of text parsed at once and rows per chunk yielded by iter_chunks
+BLOCK_SIZE = 1 << 24
+CHUNK_SIZE = 1 << 20
+
+
+def parse(text: bytes, columns: int, dtype=np.float64, line: int = 1) -> np.ndarray:
+    # Whitespace separated numbers, `columns` per row, parsed in C without per-value Python
+    # objects. line is the number of the first line of the text, for the error messages.
+    if not text.strip():
+        # np.fromstring makes up a value for text that is only whitespace
+        return np.empty((0, columns), dtype=dtype)
+    data = np.frombuffer(text, dtype=np.uint8)
+    starts = token_starts(data)
+    newlines = np.flatnonzero(data == ord('\n'))
+    check_rows(starts, newlines, columns, line)
+    try:
+        values = np.fromstring(text, dtype=dtype, sep=' ')
+    except ValueError:
+        raise_unparsed(text, starts, newlines, dtype, line)
+    if np.issubdtype(dtype, np.integer):
+        # fromstring clamps values that do not fit to the limits of the type
+        limits = np.iinfo(dtype)
+        for i in np.flatnonzero((values == limits.min) | (values == limits.max)).tolist():
+            if int(token(text, starts[i])) != values[i]:
+                raise ValueError(f"{token(text, starts[i])} on line {line_of(starts[i], newlines, line)} "
+                                 f"does not fit in {np.dtype(dtype).name}")
+    return values.reshape(-1, columns)
+
+
+def token_starts(data: np.ndarray) -> np.ndarray:
+    # Offsets of the values in the bytes of the text, a value starting at a non-space byte after
+    # a space or at the start of the text
+    filled = ~np.isin(data, np.frombuffer(b' \t\r\n\v\f', dtype=np.uint8))
+    return np.flatnonzero(filled & ~np.r_[False, filled[:-1]])
+
+
+def check_rows(starts: np.ndarray, newlines: np.ndarray, columns: int, line: int):
+    # Raises unless every non-blank line has `columns` values. The line of a value is the number
+    # of newlines before it, so only arrays as long as the values and the lines are made.
+    counts = np.bincount(np.searchsorted(newlines, starts), minlength=len(newlines) + 1)
+    bad = np.flatnonzero((counts != 0) & (counts != columns))
+    if len(bad):
+        raise ValueError(f"Expected {columns} values per row, line {line + bad[0]} has {counts[bad[0]]}")
+
+
+def raise_unparsed(text: bytes, starts: np.ndarray, newlines: np.ndarray, dtype, line: int):
+    # np.fromstring only says that it stopped; the values are tried one by one to tell which
+    convert = int if np.issubdtype(dtype, np.integer) else float
+    for start in starts.tolist():
+        value = token(text, start)
+        try:
+            convert(value)
+        except ValueError:
+            raise ValueError(f"Could not parse {value!r} on line {line_of(start, newlines, line)} "
+                             f"as {np.dtype(dtype).name}") from None
+    raise ValueError(f"Could not parse lines {line} to {line + len(newlines)} as {np.dtype(dtype).name}")
+
+
+def line_of(start: int, newlines: np.ndarray, line: int) -> int:
+    return line + int(np.searchsorted(newlines, start))
+
+
+def token(text: bytes, start: int) -> str:
+    return text[start:].split(maxsplit=1)[0].decode()
+
+
+def iter_blocks(file_name: str, columns: int, dtype=np.float64):
+    # Yields the rows of the file as arrays parsed a block of BLOCK_SIZE bytes at a time
+    tail = b''
+    line = 1
+    with open(file_name, 'rb') as file:
+        while True:
+            block = file.read(BLOCK_SIZE)
+            if not block:
+                break
+            block = tail + block
+            # Only whole lines are parsed, the rest waits for the next block
+            cut = block.rfind(b'\n') + 1
+            tail = block[cut:]
+            yield parse(block[:cut], columns, dtype, line)
+            line += block.count(b'\n', 0, cut)
+    yield parse(tail, columns, dtype, line)
+
+
+def iter_chunks(file_name: str, columns: int, dtype=np.float64, chunk_size: int = CHUNK_SIZE):
+    # Yields (chunk_size, columns) arrays (the last one may be shorter)
+    pending = np.empty((0, columns), dtype=dtype)
+    for rows in iter_blocks(file_name, columns, dtype):
+        pending = np.concatenate((pending, rows))
+        while len(pending) >= chunk_size:
+            yield pending[:chunk_size]
+            pending = pending[chunk_size:]
+    for start in range(0, len(pending), chunk_size):
+        yield pending[start:start + chunk_size]
+
+
+def read_array(file_name: str, columns: int, dtype=np.float64) -> np.ndarray:
+    # The blocks are joined once, without going through chunks
+    blocks = [rows for rows in iter_blocks(file_name, columns, dtype) if len(rows)]
+    if not blocks:
+        return np.empty((0, columns), dtype=dtype)
+    return blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
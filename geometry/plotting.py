@@ -0,0 +1,74 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Visualization is an observer: a callable taking a draw function and its arguments, where
+# draw(axes, *args) paints one snapshot onto matplotlib axes. The labs hold no observer unless
+# they are asked to render, and matplotlib is only imported once something is drawn.
+
+
+def observer(render):
+    # render=False draws nothing, True shows every snapshot in a window, anything else already
+    # is an observer such as a Recorder
+    if render is None or render is False:
+        return None
+    return show if render is True else render
+
+
+def show(draw, *args):
+    # Imported here so that the labs load without matplotlib
+    from matplotlib import pyplot as plt
+
+    _, axes = plt.subplots()
+    draw(axes, *args)
+    plt.show()
+
+
+class Recorder:
+    # Observer that saves the snapshots as numbered PNG or SVG files in a directory. A snapshot
+    # only queues the draw function and its arguments, so they must not change afterwards; full
+    # batches are rendered on a background thread without pyplot. close() writes the rest.
+    def __init__(self, directory, format='png', batch_size=32):
+        self.directory = directory
+        self.format = format
+        self.batch_size = batch_size
+        self.count = 0
+        self.pending = []
+        self.rendering = []
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, draw, *args):
+        self.pending.append((self.count, draw, args))
+        self.count += 1
+        if len(self.pending) >= self.batch_size:
+            self._submit()
+
+    def close(self):
+        self._submit()
+        for future in self.rendering:
+            future.result()
+        self.rendering = []
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _submit(self):
+        if self.pending:
+            self.rendering.append(self.executor.submit(self._render, self.pending))
+            self.pending = []
+        # Raises the errors of finished batches
+        for future in [future for future in self.rendering if future.done()]:
+            self.rendering.remove(future)
+            future.result()
+
+    def _render(self, batch):
+        from matplotlib.figure import Figure
+
+        for index, draw, args in batch:
+            figure = Figure()
+            draw(figure.add_subplot(), *args)
+            figure.savefig(os.path.join(self.directory, f'{index:06d}.{self.format}'))
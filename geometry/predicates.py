@@ -0,0 +1,150 @@
+from fractions import Fraction
+
+import numpy as np
+
+# Points are anything with x and y attributes holding ints, floats or Fractions.
+# Every predicate first evaluates in floats and only falls back to exact rational arithmetic
+# when the float result is too close to zero to trust its sign.
+
+EPSILON = 2.0 ** -53
+# Shewchuk's bound on the rounding error of the float orientation determinant
+ORIENTATION_BOUND = (3 + 16 * EPSILON) * EPSILON
+# Bound on the rounding error of y at a given x along a segment, relative to the input magnitudes
+COMPARE_BOUND = 16 * EPSILON
+
+# How often each predicate ran and how often it needed the exact path
+counters = {'orientation': 0, 'orientation_exact': 0, 'compare': 0, 'compare_exact': 0, 'intersection': 0,
+            'crossing_exact': 0}
+
+
+def reset_counters():
+    for key in counters:
+        counters[key] = 0
+
+
+def exact(value):
+    # Ints and Fractions are already exact, a float converts to a Fraction without rounding
+    return Fraction(value) if isinstance(value, float) else value
+
+
+def sign(value) -> int:
+    return (value > 0) - (value < 0)
+
+
+def orientation(a, b, c) -> int:
+    # 1 if a, b, c turn counter-clockwise, -1 if clockwise, 0 if collinear
+    counters['orientation'] += 1
+    ax, ay, bx, by, cx, cy = a.x, a.y, b.x, b.y, c.x, c.y
+    rounded = not type(ax) is type(ay) is type(bx) is type(by) is type(cx) is type(cy) is float
+    if rounded:
+        if type(ax) is type(ay) is type(bx) is type(by) is type(cx) is type(cy) is int:
+            return sign((bx - ax) * (cy - ay) - (by - ay) * (cx - ax))
+        ax, ay, bx, by, cx, cy = float(ax), float(ay), float(bx), float(by), float(cx), float(cy)
+    left = (bx - ax) * (cy - ay)
+    right = (by - ay) * (cx - ax)
+    determinant = left - right
+    bound = ORIENTATION_BOUND * (abs(left) + abs(right))
+    if rounded:
+        # Ints and Fractions converted to floats are each off by up to EPSILON of their magnitude
+        bound += 2 * EPSILON * ((abs(ax) + abs(bx)) * abs(cy - ay) + (abs(ay) + abs(cy)) * abs(bx - ax) +
+                                (abs(ay) + abs(by)) * abs(cx - ax) + (abs(ax) + abs(cx)) * abs(by - ay))
+    if abs(determinant) > bound:
+        return sign(determinant)
+
+    counters['orientation_exact'] += 1
+    ax, ay = exact(a.x), exact(a.y)
+    return sign((exact(b.x) - ax) * (exact(c.y) - ay) - (exact(b.y) - ay) * (exact(c.x) - ax))
+
+
+def orientation_signs(ax, ay, bx, by, cx, cy):
+    # orientation for float64 arrays: the signs, and a mask of the ones the float filter
+    # could decide (the rest need the exact test)
+    left = (bx - ax) * (cy - ay)
+    right = (by - ay) * (cx - ax)
+    determinant = left - right
+    certain = np.abs(determinant) > ORIENTATION_BOUND * (np.abs(left) + np.abs(right))
+    return np.sign(determinant).astype(np.int8), certain
+
+
+def compare_at_x(a1, a2, b1, b2, x) -> int:
+    # Sign of y(a) - y(b) at the vertical line x, which must cross both non-vertical segments
+    counters['compare'] += 1
+    qx = float(x)
+    a1x, a1y, a2x, a2y = float(a1.x), float(a1.y), float(a2.x), float(a2.y)
+    b1x, b1y, b2x, b2y = float(b1.x), float(b1.y), float(b2.x), float(b2.y)
+    if a1x != a2x and b1x != b2x:
+        a_slope = (a2y - a1y) / (a2x - a1x)
+        b_slope = (b2y - b1y) / (b2x - b1x)
+        difference = (a1y + (qx - a1x) * a_slope) - (b1y + (qx - b1x) * b_slope)
+        # Rounding of the arithmetic and of the inputs themselves, which shifts y by the slope
+        # times the error of x
+        bound = COMPARE_BOUND * (abs(a1y) + abs(a2y) + abs(b1y) + abs(b2y) +
+                                 (abs(qx) + abs(a1x) + abs(a2x)) * abs(a_slope) +
+                                 (abs(qx) + abs(b1x) + abs(b2x)) * abs(b_slope))
+        if abs(difference) > bound:
+            return sign(difference)
+
+    counters['compare_exact'] += 1
+    return sign(exact_y_at(a1, a2, x) - exact_y_at(b1, b2, x))
+
+
+def exact_y_at(start, end, x):
+    x1, y1 = exact(start.x), exact(start.y)
+    return y1 + (exact(x) - x1) * (exact(end.y) - y1) / (exact(end.x) - x1)
+
+
+def intersects(a1, a2, b1, b2) -> bool:
+    # Whether the segments have exactly one common point, without computing it
+    a_side1 = orientation(b1, b2, a1)
+    a_side2 = orientation(b1, b2, a2)
+    if a_side1 == a_side2 == 0 or a_side1 * a_side2 > 0:
+        return False
+    return orientation(a1, a2, b1) * orientation(a1, a2, b2) <= 0
+
+
+def intersection(a1, a2, b1, b2):
+    # The common point of segments a1a2 and b1b2 as exact (x, y), or None when they are disjoint
+    # or parallel (collinear overlaps have no single point)
+    counters['intersection'] += 1
+    if not intersects(a1, a2, b1, b2):
+        return None
+    return line_crossing(a1, a2, b1, b2)
+
+
+def line_crossing(a1, a2, b1, b2):
+    # The exact common point of the lines through a1a2 and b1b2, or None when they are parallel
+    ax, ay = exact(a1.x), exact(a1.y)
+    adx, ady = exact(a2.x) - ax, exact(a2.y) - ay
+    bdx, bdy = exact(b2.x) - exact(b1.x), exact(b2.y) - exact(b1.y)
+    denominator = adx * bdy - ady * bdx
+    if denominator == 0:
+        return None
+    t = Fraction((exact(b1.x) - ax) * bdy - (exact(b1.y) - ay) * bdx) / denominator
+    return ax + t * adx, ay + t * ady
+
+
+def crosses_before(a1, a2, b1, b2, point) -> bool:
+    # Whether the lines through a1a2 and b1b2 cross before the point in (x, y) order; parallel
+    # lines never cross and count as before. Decided by the x of the crossing in floats when it
+    # is far enough from the point.
+    values = (a1.x, a1.y, a2.x, a2.y, b1.x, b1.y, b2.x, b2.y, point.x)
+    if all(type(value) is float for value in values):
+        adx, ady = a2.x - a1.x, a2.y - a1.y
+        bdx, bdy = b2.x - b1.x, b2.y - b1.y
+        cx, cy = b1.x - a1.x, b1.y - a1.y
+        denominator = adx * bdy - ady * bdx
+        numerator = cx * bdy - cy * bdx
+        denominator_error = 8 * EPSILON * (abs(adx * bdy) + abs(ady * bdx))
+        numerator_error = 8 * EPSILON * (abs(cx * bdy) + abs(cy * bdx))
+        if abs(denominator) > 2 * denominator_error:
+            t = numerator / denominator
+            t_error = (abs(numerator) * denominator_error + abs(denominator) * numerator_error) / \
+                (abs(denominator) * (abs(denominator) - denominator_error))
+            x = a1.x + t * adx
+            error = 2 * t_error * abs(adx) + 8 * EPSILON * (abs(a1.x) + abs(t * adx) + abs(point.x))
+            if abs(x - point.x) > error:
+                return x < point.x
+
+    counters['crossing_exact'] += 1
+    crossing = line_crossing(a1, a2, b1, b2)
+    return crossing is None or crossing < (point.x, point.y)
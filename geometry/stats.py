@@ -0,0 +1,76 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from geometry import predicates
+
+# Counters and timings of the hot paths, off unless a collect() block is running. Instrumented
+# functions count in local variables and test `stats.enabled` once per call before they
+# record anything, so they cost next to nothing when it is off.
+
+enabled = False
+collector = None
+
+
+class Collector:
+    # Totals of every counter, the largest value of every gauge, and the record of every call
+    # when keep is set. A record is a dict with the name of the operation, its counters and
+    # gauges and, when timing, duration_ns. The sink gets every record as it is made, for
+    # example to pass it on to a metrics pipeline.
+    def __init__(self, timing=True, sink=None, keep=True):
+        self.timing = timing
+        self.sink = sink
+        self.keep = keep
+        self.counters = Counter()
+        self.peaks = {}
+        self.records = []
+
+    def slowest(self, name, count=10):
+        calls = [entry for entry in self.records if entry['name'] == name]
+        return sorted(calls, key=lambda entry: entry.get('duration_ns', 0), reverse=True)[:count]
+
+
+@contextmanager
+def collect(timing=True, sink=None, keep=True):
+    # Enables the instrumentation in the block; the innermost block gets the records
+    global enabled, collector
+    previous = enabled, collector
+    collector = Collector(timing, sink, keep)
+    enabled = True
+    before = dict(predicates.counters)
+    try:
+        yield collector
+    finally:
+        # The predicates count all the time, the block gets what they did inside it
+        for key, value in predicates.counters.items():
+            collector.counters['predicates.' + key] += value - before[key]
+        enabled, collector = previous
+
+
+def start():
+    # Start of a timed call: perf_counter_ns when collecting with timing, 0 otherwise
+    return time.perf_counter_ns() if enabled and collector.timing else 0
+
+
+def record(name, start=0, gauges=None, **counters):
+    # Records one call; callers test `enabled` first. The counters are also added to the
+    # totals as name.counter, next to name.calls. Gauges are sizes such as a height or the
+    # largest queue, which mean nothing summed: peaks keeps the largest one as name.gauge.
+    entry = {'name': name, **counters}
+    if gauges:
+        entry.update(gauges)
+    if start:
+        entry['duration_ns'] = time.perf_counter_ns() - start
+    totals = collector.counters
+    totals[name + '.calls'] += 1
+    for key, value in counters.items():
+        totals[f'{name}.{key}'] += value
+    if gauges:
+        peaks = collector.peaks
+        for key, value in gauges.items():
+            key = f'{name}.{key}'
+            peaks[key] = max(peaks.get(key, value), value)
+    if collector.keep:
+        collector.records.append(entry)
+    if collector.sink:
+        collector.sink(entry)